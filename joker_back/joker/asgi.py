@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "joker.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.urls import reverse  # noqa: E402
+from main.events import CancelOnDisconnect  # noqa: E402
+
+# End the endless event streams when their client goes away
+application = CancelOnDisconnect(django_application, paths=[reverse("events")])
@@ -106,6 +106,7 @@ CORS_ALLOW_HEADERS = [
     "authorization",
     "content-type",
     "dnt",
+    "idempotency-key",
     "origin",
     "user-agent",
     "x-csrftoken",
@@ -116,16 +117,35 @@ CORS_ALLOW_HEADERS = [
 if os.environ.get('CORS_ALLOWED_ORIGINS'):
     CORS_ALLOWED_ORIGINS.extend(os.environ.get('CORS_ALLOWED_ORIGINS').split(','))
 
+# Local-memory cache evicts the least recently used entries past
+# MAX_ENTRIES. It is per process; cached statistics are keyed on versions
+# stored in the database, so every worker sees the same invalidations.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "joker",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+}
+
 ROOT_URLCONF = "joker.urls"
 AUTHENTICATION_CLASSES = ("dj_rest_auth.authentication.AllAuthJWTAuthentication",)
 
+# orjson-backed JSON renderer and parser (main.renderers / main.parsers).
+# They fall back to the stdlib json module when orjson is not installed.
+FAST_JSON = os.environ.get('FAST_JSON', 'True') == 'True'
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.TokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "main.renderers.FastJSONRenderer" if FAST_JSON else "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PARSER_CLASSES": [
-        "rest_framework.parsers.JSONParser",
+        "main.parsers.FastJSONParser" if FAST_JSON else "rest_framework.parsers.JSONParser",
         "rest_framework.parsers.FormParser",
         "rest_framework.parsers.MultiPartParser",
     ],
@@ -267,4 +287,13 @@ SESSION_COOKIE_SAMESITE = 'None'
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
\ No newline at end of file
+FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
+
+# Store design images locally on order creation and let the
+# `process_uploads` worker push them to DEFAULT_FILE_STORAGE afterwards
+DEFERRED_IMAGE_UPLOADS = os.environ.get('DEFERRED_IMAGE_UPLOADS', 'False') == 'True'
+
+# Broker fanning out the server-sent events of /api/events/. The in-process
+# broker only reaches streams served by the same process.
+EVENTS_BROKER = 'main.events.InProcessBroker'
+EVENTS_KEEPALIVE = 15  # seconds
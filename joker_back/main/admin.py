@@ -1,5 +1,7 @@
 from django.contrib import admin
+from .counters import set_contacts_read
 from .models import User, Request, Contact
+from .search import CONTACT_SEARCH_FIELDS, REQUEST_SEARCH_FIELDS, search
 
 # Register your models here.
 admin.site.register(User)
@@ -16,22 +18,29 @@ class RequestAdmin(admin.ModelAdmin):
         "is_seen",
         "is_delivered",
     )
-    search_fields = ("article", "size", "is_delivered")
+    search_fields = REQUEST_SEARCH_FIELDS
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains on every column
+        return search(queryset, self.search_fields, search_term), False
 
 
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
     list_display = ("fullName", "email", "phoneNumber", "timestamp", "read")
     list_filter = ("read", "timestamp")
-    search_fields = ("fullName", "email", "phoneNumber", "message")
+    search_fields = CONTACT_SEARCH_FIELDS
+
+    def get_search_results(self, request, queryset, search_term):
+        return search(queryset, self.search_fields, search_term), False
     readonly_fields = ("timestamp",)
     
     def mark_as_read(self, request, queryset):
-        queryset.update(read=True)
+        set_contacts_read(queryset, True)
     mark_as_read.short_description = "Mark selected messages as read"
     
     def mark_as_unread(self, request, queryset):
-        queryset.update(read=False)
+        set_contacts_read(queryset, False)
     mark_as_unread.short_description = "Mark selected messages as unread"
     
     actions = ["mark_as_read", "mark_as_unread"]
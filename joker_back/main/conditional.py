@@ -0,0 +1,55 @@
+import hashlib
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
+from rest_framework.exceptions import APIException
+
+from .counters import counter_values
+
+
+class NotModified(APIException):
+    status_code = 304
+
+
+class ConditionalGetMixin:
+    """
+    ETag validators for GET/HEAD built from change sequences of the counter
+    store. A matching If-None-Match is answered with 304 before the view
+    queries or serializes anything.
+    """
+    # Counter store sequences the responses of the view depend on
+    etag_sequences = ()
+
+    def get_etag(self, request):
+        # Kept for the view, which may key its own caches on them
+        self.sequence_values = counter_values(*self.etag_sequences)
+        key = "|".join([
+            request.get_full_path(),
+            request.accepted_media_type or "",
+            *map(str, self.sequence_values),
+        ])
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method in ("GET", "HEAD") and self.etag_sequences:
+            self.etag = self.get_etag(request)
+            if self.etag in parse_etags(request.headers.get("If-None-Match", "")):
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            response = HttpResponseNotModified()
+            response["ETag"] = self.etag
+            return response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "etag", None) and response.status_code == 200:
+            response["ETag"] = self.etag
+            # The responses differ per token/session, never share them
+            response["Cache-Control"] = "private, no-cache"
+        return response
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Contact, Counter, Request
+
+REQUEST_STATES = [state for state, _ in Request.request_choices]
+UNREAD_CONTACTS = "contacts:unread"
+
+# Change sequences, bumped by every write to what they cover (ETag validators)
+REQUESTS_SEQUENCE = "requests:sequence"
+CONTACTS_SEQUENCE = "contacts:sequence"
+STATISTICS_SEQUENCE = "statistics:sequence"
+# Bumped only by writes to the rollups of days before today
+STATISTICS_HISTORY_SEQUENCE = "statistics:history"
+
+
+def request_counter(state):
+    return f"requests:{state}"
+
+
+COUNTER_NAMES = [*map(request_counter, REQUEST_STATES), UNREAD_CONTACTS]
+SEQUENCES = (
+    REQUESTS_SEQUENCE,
+    CONTACTS_SEQUENCE,
+    STATISTICS_SEQUENCE,
+    STATISTICS_HISTORY_SEQUENCE,
+)
+
+
+def real_counts():
+    """Count every counter from the tables, one grouped query per table"""
+    counts = dict.fromkeys(COUNTER_NAMES, 0)
+    for row in Request.objects.values("state").annotate(count=Count("id")).order_by():
+        counts[request_counter(row["state"])] = row["count"]
+    counts[UNREAD_CONTACTS] = Contact.objects.filter(read=False).count()
+    return counts
+
+
+def adjust_counters(deltas):
+    """
+    Apply {name: delta} to the counters. Runs in the caller's transaction, so
+    the counters move together with the rows they count.
+    """
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        updated = Counter.objects.filter(name=name).update(value=F("value") + delta)
+        if not updated:
+            # First change since the store was emptied, the row change is
+            # already visible to this transaction
+            value = real_counts().get(name, 0) if name not in SEQUENCES else delta
+            Counter.objects.get_or_create(name=name, defaults={"value": value})
+
+
+def transition_deltas(previous_states, new_state):
+    """Counter deltas of requests moving from their previous states to new_state"""
+    deltas = {}
+    for state in previous_states:
+        if state != new_state:
+            deltas[request_counter(state)] = deltas.get(request_counter(state), 0) - 1
+            deltas[request_counter(new_state)] = deltas.get(request_counter(new_state), 0) + 1
+    return deltas
+
+
+def counter_values(*names):
+    """Read counters by name, creating the missing ones from the real counts"""
+    values = dict(Counter.objects.filter(name__in=names).values_list("name", "value"))
+    if set(names) - set(values) - set(SEQUENCES):
+        reconcile_counters()
+        values = dict(Counter.objects.filter(name__in=names).values_list("name", "value"))
+    # A sequence nothing has bumped yet starts at 0
+    return [values.get(name, 0) for name in names]
+
+
+def reconcile_counters():
+    """
+    Reset the counters to the real counts. Returns the drifted ones as
+    {name: (stored, real)}.
+    """
+    with transaction.atomic():
+        # Lock first: writers adjusting a counter wait, and their row changes
+        # are committed (and counted) before ours
+        stored = dict(
+            Counter.objects.select_for_update().values_list("name", "value")
+        )
+        counts = real_counts()
+        Counter.objects.bulk_create(
+            [Counter(name=name, value=value) for name, value in counts.items()],
+            update_conflicts=True,
+            unique_fields=["name"],
+            update_fields=["value"],
+        )
+    return {
+        name: (stored.get(name), value)
+        for name, value in counts.items()
+        if stored.get(name) != value
+    }
+
+
+def set_contacts_read(queryset, read):
+    """Mark the contacts of a queryset read or unread with one UPDATE"""
+    with transaction.atomic():
+        changed = queryset.exclude(read=read).update(read=read)
+        if changed:
+            adjust_counters({
+                UNREAD_CONTACTS: -changed if read else changed,
+                CONTACTS_SEQUENCE: 1,
+            })
+    return changed
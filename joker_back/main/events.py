@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import json
+import threading
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Events queued for a slow subscriber before newer ones are dropped
+MAX_PENDING_EVENTS = 1000
+
+# Seconds a stream ticket may wait before it is redeemed
+STREAM_TICKET_MAX_AGE = 30
+STREAM_TICKET_SALT = "main.events.stream-ticket"
+
+
+class InProcessBroker:
+    """
+    Fan events out to the event streams served by this process. Publishing
+    is thread-safe, so events raised by synchronous views reach the
+    subscribers waiting on the ASGI event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        """Return a queue receiving every event published from now on"""
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = {
+                subscriber for subscriber in self._subscribers if subscriber[1] is not queue
+            }
+
+    def publish(self, event_type, data):
+        event = {"id": next(self._ids), "type": event_type, "data": data}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, event)
+            except RuntimeError:
+                # The subscriber's loop is closed, its stream is gone
+                self.unsubscribe(queue)
+
+
+def _deliver(queue, event):
+    if queue.qsize() < MAX_PENDING_EVENTS:
+        queue.put_nowait(event)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENTS_BROKER)()
+
+
+def publish_event(event_type, data):
+    """Publish an event once the current transaction has committed"""
+    transaction.on_commit(lambda: get_broker().publish(event_type, data))
+
+
+def format_sse(event):
+    """Encode an event in the Server-Sent Events wire format"""
+    data = json.dumps(event["data"], cls=DjangoJSONEncoder)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n".encode()
+
+
+def issue_stream_ticket(user):
+    """
+    A signed, short-lived and single-use ticket opening one event stream
+    for the user. EventSource cannot send headers, and a ticket in the URL
+    is harmless once used, unlike an API token.
+    """
+    return signing.dumps(
+        {"user": user.pk, "nonce": uuid.uuid4().hex}, salt=STREAM_TICKET_SALT
+    )
+
+
+def redeem_stream_ticket(ticket):
+    """Return the user id of a valid ticket not redeemed before, else None"""
+    try:
+        payload = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=STREAM_TICKET_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    # Tickets are used by the process serving the streams, see EVENTS_BROKER
+    if not cache.add(f"events:ticket:{payload['nonce']}", True, STREAM_TICKET_MAX_AGE):
+        return None
+    return payload["user"]
+
+
+class CancelOnDisconnect:
+    """
+    ASGI middleware cancelling the requests to the given paths once the
+    client disconnects. Django 4.2 does not listen for http.disconnect
+    while streaming, so an endless stream would outlive its client and
+    keep its broker subscription.
+    """
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        body_read = asyncio.Event()
+
+        async def receive_body():
+            message = await receive()
+            if message["type"] != "http.request" or not message.get("more_body"):
+                body_read.set()
+            return message
+
+        async def wait_for_disconnect():
+            # The app stops reading once it has the body, then we listen
+            await body_read.wait()
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        tasks = [
+            asyncio.create_task(self.app(scope, receive_body, send)),
+            asyncio.create_task(wait_for_disconnect()),
+        ]
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if not tasks[0].cancelled():
+            tasks[0].result()
@@ -0,0 +1,136 @@
+import hashlib
+import json
+from collections.abc import Mapping
+from datetime import timedelta
+
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Request, Submission
+from .signals import requests_updated
+from .utils import content_hash
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# A first submission still unfinished after this long is considered lost
+PENDING_SUBMISSION_TIMEOUT = timedelta(minutes=5)
+# Submissions are only recognised as repeats within this window; later, the
+# same design ordered again is a new order
+SUBMISSION_REPLAY_WINDOW = timedelta(hours=24)
+# Characters of a text value hashed per step, so large base64 images are
+# never copied whole
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class SubmissionInProgress(Exception):
+    pass
+
+
+class SubmissionMismatch(Exception):
+    """The Idempotency-Key was used before for another payload"""
+
+
+def payload_hash(data):
+    """Hash of a submitted payload, uploaded files included by content"""
+    digest = hashlib.sha256()
+    items = data.lists() if hasattr(data, "lists") else data.items()
+    for name, values in sorted(items, key=lambda item: item[0]):
+        for value in values if isinstance(values, list) else [values]:
+            if isinstance(value, UploadedFile):
+                digest.update(content_hash(value).encode())
+                value = value.name
+            digest.update(name.encode() + b"\0")
+            if isinstance(value, str):
+                for start in range(0, len(value), HASH_CHUNK_SIZE):
+                    digest.update(value[start:start + HASH_CHUNK_SIZE].encode())
+            else:
+                digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def submission_key(request):
+    """
+    The key of a submission, from the Idempotency-Key header or, failing
+    that, the visitor uuid plus the payload hash, and the payload hash.
+    (None, None) when the submission cannot be recognised.
+    """
+    if not isinstance(request.data, Mapping):
+        # Not an order at all, the serializer rejects it
+        return None, None
+    header = request.headers.get(IDEMPOTENCY_HEADER)
+    digest = payload_hash(request.data)
+    if header:
+        key = f"key:{header}"
+    elif request.data.get("uuid"):
+        key = f"uuid:{request.data['uuid']}:{digest}"
+    else:
+        return None, None
+    return hashlib.sha256(key.encode()).hexdigest(), digest
+
+
+def claim_submission(key, digest):
+    """
+    Register a first submission under the key and return None, or return
+    the completed Submission of an earlier one. Raises SubmissionInProgress
+    while the earlier one is still being processed, and SubmissionMismatch
+    when it had another payload.
+    """
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                Submission.objects.create(key=key, payload_hash=digest)
+            return None
+        except IntegrityError:
+            submission = Submission.objects.filter(key=key).first()
+        if submission is None:
+            continue
+        now = timezone.now()
+        if submission.request_id is not None:
+            if submission.created_at > now - SUBMISSION_REPLAY_WINDOW:
+                if submission.payload_hash != digest:
+                    raise SubmissionMismatch(key)
+                return submission
+            # Too old to be a retry: the same order placed again
+            Submission.objects.filter(
+                pk=submission.pk, created_at=submission.created_at
+            ).delete()
+            continue
+        if submission.created_at > now - PENDING_SUBMISSION_TIMEOUT:
+            raise SubmissionInProgress(key)
+        # The first attempt died before completing, let this one take over
+        Submission.objects.filter(pk=submission.pk, request__isnull=True).delete()
+    raise SubmissionInProgress(key)
+
+
+def purge_submissions():
+    """Delete the submissions too old to be replayed, returns how many"""
+    deleted, _ = Submission.objects.filter(
+        created_at__lt=timezone.now() - SUBMISSION_REPLAY_WINDOW
+    ).delete()
+    return deleted
+
+
+def complete_submission(key, request_id, status, body):
+    Submission.objects.filter(key=key).update(
+        request_id=request_id, response_status=status, response_body=body
+    )
+
+
+def release_submission(key):
+    """Forget a first submission that failed, so it can be retried"""
+    Submission.objects.filter(key=key, request__isnull=True).delete()
+
+
+def count_repetition(submission):
+    """Count a repeated submission on its request with one F() update"""
+    with transaction.atomic():
+        Request.objects.filter(pk=submission.request_id).update(
+            repetitions=F("repetitions") + 1
+        )
+        requests_updated.send(
+            sender=Request,
+            ids=[submission.request_id],
+            changes={"repetitions": F("repetitions") + 1},
+        )
@@ -0,0 +1,122 @@
+import base64
+import io
+import os
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from main.models import Request
+from main.parsers import FastJSONParser
+from main.renderers import FastJSONRenderer, orjson
+from main.serializers import RequestSerializer
+from main.views import RequestViewSet
+
+
+def list_page(rows):
+    """A serialized /api/requests/ page, rendered from unsaved requests"""
+    now = timezone.now()
+    requests = []
+    for index in range(rows):
+        request = Request(
+            pk=index + 1,
+            article=Request.article_choices[index % 4][0],
+            description="Logo on the chest, name on the back " * 3,
+            phone="0550000000",
+            city="Alger",
+            name=f"Client {index}",
+            text="Joker",
+            color="black",
+            size="L",
+            quantity=index % 3 + 1,
+            creation_date=now - timedelta(minutes=index),
+            state="unseen",
+            first_url="https://example.com/products/t-shirt",
+            last_url="https://example.com/checkout",
+            referrer="https://www.google.com/",
+            uuid=f"{int(now.timestamp() * 1000)}-{index}",
+            price=2500,
+        )
+        # What the list queryset annotates
+        request.fallback_picture = None
+        requests.append(request)
+    fields = [
+        name for name in RequestSerializer().fields
+        if name not in RequestViewSet.list_excluded_fields
+    ]
+    return {
+        "results": RequestSerializer(requests, many=True, fields=fields).data,
+        "count": rows,
+        "page": 1,
+        "total_pages": 1,
+    }
+
+
+def order_body(image_size):
+    """A legacy order creation body carrying base64 front and back designs"""
+    encoded = base64.b64encode(os.urandom(image_size)).decode()
+    return JSONRenderer().render({
+        "article": "t_shirt",
+        "phone": "0550000000",
+        "color": "black",
+        "size": "L",
+        "quantity": 1,
+        "price": 2500,
+        "frontImage": f"data:image/png;base64,{encoded}",
+        "backImage": f"data:image/png;base64,{encoded}",
+    })
+
+
+def timed(function, repeat):
+    """Median wall time of `repeat` calls, in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations) * 1000
+
+
+class Command(BaseCommand):
+    help = "Compare the stdlib and orjson renderer/parser on realistic Request payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200, help="Rows of the list page")
+        parser.add_argument(
+            "--image-size", type=int, default=2 * 1024 * 1024,
+            help="Bytes of each design image in the order body (before base64)",
+        )
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement")
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("orjson is not installed, the fast mode falls back to the stdlib")
+        repeat = options["repeat"]
+        page = list_page(options["rows"])
+        body = order_body(options["image_size"])
+
+        cases = [
+            (
+                f"render {options['rows']}-row list page",
+                lambda: JSONRenderer().render(page),
+                lambda: FastJSONRenderer().render(page),
+            ),
+            (
+                f"parse {len(body) / 1024 / 1024:.1f} MB order body",
+                lambda: JSONParser().parse(io.BytesIO(body)),
+                lambda: FastJSONParser().parse(io.BytesIO(body)),
+            ),
+        ]
+        for label, standard, fast in cases:
+            if standard() != fast():
+                raise CommandError(f"{label}: both modes must produce the same result")
+            standard_ms = timed(standard, repeat)
+            fast_ms = timed(fast, repeat)
+            self.stdout.write(
+                f"{label}: stdlib {standard_ms:.2f} ms, orjson {fast_ms:.2f} ms "
+                f"({standard_ms / fast_ms:.1f}x)"
+            )
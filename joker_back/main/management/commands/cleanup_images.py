@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from main.models import Picture, Request, StoredImage
+
+
+class Command(BaseCommand):
+    help = "Delete stored design images that are no longer referenced"
+
+    def handle(self, *args, **options):
+        deleted = repaired = 0
+        for stored_id in StoredImage.objects.filter(ref_count=0).values_list("id", flat=True):
+            with transaction.atomic():
+                stored = (
+                    StoredImage.objects.select_for_update()
+                    .filter(pk=stored_id, ref_count=0)
+                    .first()
+                )
+                if stored is None:
+                    continue
+                name = stored.file.name
+                # Never trust the counter alone before deleting a file
+                references = (
+                    Request.objects.filter(Q(front_image=name) | Q(back_image=name)).count()
+                    + Picture.objects.filter(image=name).count()
+                )
+                if references:
+                    stored.ref_count = references
+                    stored.save(update_fields=["ref_count"])
+                    repaired += 1
+                    continue
+                stored.file.delete(save=False)
+                stored.delete()
+                deleted += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {deleted} unreferenced images ({repaired} counters repaired)"
+            )
+        )
@@ -1,47 +1,205 @@
 # generate_fixtures.py
 import random
-from datetime import datetime, timedelta
-from faker import Faker
-from django.core.management.base import BaseCommand
-from main.models import Request  # Adjust the import according to your app name
+import time
+from datetime import datetime, time as day_time, timedelta
+from functools import lru_cache
+from itertools import accumulate
 
-fake = Faker()
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+try:
+    from faker import Faker
+except ImportError:  # development dependency, see requirements-dev.txt
+    Faker = None
+
+from main.counters import CONTACTS_SEQUENCE, REQUESTS_SEQUENCE, adjust_counters, reconcile_counters
+from main.models import Contact, Picture, Request
+from main.statistics import rebuild_daily_statistics
+
+# (value, weight) pairs of the generated columns
+ARTICLES = (("t_shirt", 50), ("sweet_shirt", 20), ("mug", 20), ("key_ring", 10))
+PRICES = {"t_shirt": 2500, "sweet_shirt": 4500, "mug": 1200, "key_ring": 600}
+COLORS = (("white", 40), ("black", 35), ("red", 10), ("blue", 10), ("green", 5))
+SIZES = (("S", 10), ("M", 30), ("L", 30), ("XL", 20), ("XXL", 10))
+QUANTITIES = ((1, 80), (2, 15), (3, 5))
+CITIES = ["Alger", "Oran", "Constantine", "Annaba", "Blida", "Setif", "Batna", "Tlemcen", "Bejaia"]
+# Orders per hour of the day, local time
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 1, 2, 3, 5, 7, 8, 8, 7, 7, 8, 9, 10, 10, 11, 12, 12, 10, 6, 3]
+# Friday and Saturday are the weekend
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.0, 1.0, 0.6, 0.7, 1.0]
+# Sizes of the pools the text columns are drawn from; faker is too slow per row
+POOL_SIZE = 1000
+# Rows per UPDATE restoring the contact timestamps; bulk_update writes one
+# CASE branch per row
+TIMESTAMP_BATCH_SIZE = 500
+
+
+def weighted(rng, pairs):
+    values, cum_weights = _cumulative(pairs)
+    return rng.choices(values, cum_weights=cum_weights)[0]
+
+
+@lru_cache(maxsize=None)
+def _cumulative(pairs):
+    values, weights = zip(*pairs)
+    return values, list(accumulate(weights))
+
+
+def state_for_age(rng, age):
+    """Recent orders are still open, old ones are mostly finished"""
+    if age < 2:
+        return weighted(rng, (("unseen", 60), ("seen", 30), ("pending", 10)))
+    if age < 7:
+        return weighted(rng, (("unseen", 5), ("seen", 20), ("pending", 40), ("progress", 35)))
+    return weighted(rng, (("seen", 3), ("pending", 4), ("progress", 5), ("finished", 88)))
 
 
 class Command(BaseCommand):
-    help = "Generate random request fixtures"
+    help = "Generate a reproducible synthetic dataset of requests, pictures and contacts"
 
-    def handle(self, *args, **kwargs):
-        start_date = datetime.strptime("2023-08-01", "%Y-%m-%d")
-        end_date = datetime.strptime("2024-08-01", "%Y-%m-%d")
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20, help="Requests to create")
+        parser.add_argument("--contacts", type=int, default=0, help="Contact messages to create")
+        parser.add_argument(
+            "--images", type=float, default=0.0,
+            help="Share of requests with design image references (0-1), "
+            "half of them with a back picture",
+        )
+        parser.add_argument("--days", type=int, default=365, help="Days of history, ending today")
+        parser.add_argument("--seed", type=int, default=42, help="Same seed, same dataset")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per INSERT")
 
-        for _ in range(20):
-            # Random date between start_date and end_date
-            creation_date = start_date + timedelta(
-                days=random.randint(0, (end_date - start_date).days)
-            )
+    def handle(self, *args, **options):
+        if options["days"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--days and --batch-size must be positive")
+        if Faker is None:
+            raise CommandError("Faker is missing: pip install -r requirements-dev.txt")
+        self.rng = random.Random(options["seed"])
+        fake = Faker()
+        fake.seed_instance(options["seed"])
+        self.pools = {
+            "name": [fake.name() for _ in range(POOL_SIZE)],
+            "phone": [fake.numerify("0#########") for _ in range(POOL_SIZE)],
+            "email": [fake.email() for _ in range(POOL_SIZE)],
+            "description": [fake.text(max_nb_chars=200) for _ in range(POOL_SIZE)],
+            "text": [fake.text(max_nb_chars=100) for _ in range(POOL_SIZE)],
+            "url": [fake.url() for _ in range(POOL_SIZE)],
+        }
+        today = timezone.localdate()
+        self.days = [today - timedelta(days=n) for n in range(options["days"] - 1, -1, -1)]
+        # Traffic grows over the period and dips on weekends
+        self.day_weights = list(accumulate(
+            (1 + index / len(self.days)) * WEEKDAY_WEIGHTS[day.weekday()]
+            for index, day in enumerate(self.days)
+        ))
+        self.hour_weights = list(accumulate(HOUR_WEIGHTS))
+        self.today = today
+        self.batch_size = options["batch_size"]
 
-            Request.objects.create(
-                article=random.choice(["t_shirt", "sweet_shirt", "mug", "key_ring"]),
-                description=fake.text(max_nb_chars=200),
-                phone=fake.phone_number(),
-                text=fake.text(max_nb_chars=100),
-                color=random.choice(["white", "black", "red", "blue", "green"]),
-                size=random.choice(["S", "M", "L", "XL", "XXL"]),
-                creation_date=creation_date,
-                is_seen=random.choice([True, False]),
-                state=random.choice(["unseen", "pending", "progress", "finished"]),
-                is_delivered=random.choice([True, False]),
-                submitted_date=fake.date_time_this_year(
-                    before_now=True, after_now=False
-                ),
-                first_url=fake.url(),
-                last_url=fake.url(),
-                referrer=fake.text(max_nb_chars=100),
-                repetitions=random.randint(0, 100),
-                uuid=fake.uuid4(),
-                price=random.randint(10, 1000),
-            )
+        started = time.monotonic()
+        self.image_share = options["images"]
+        self.generate("requests", options["requests"], self.request_batch)
+        self.generate("contacts", options["contacts"], self.contact_batch)
+
+        # bulk_create sends no signals: rebuild what they would have maintained
+        days = rebuild_daily_statistics(self.days[0], self.days[-1])
+        reconcile_counters()
+        adjust_counters({REQUESTS_SEQUENCE: 1, CONTACTS_SEQUENCE: 1})
         self.stdout.write(
-            self.style.SUCCESS("Successfully generated 20 request fixtures")
+            self.style.SUCCESS(
+                f"Successfully generated {options['requests']} requests and "
+                f"{options['contacts']} contacts over {days} days "
+                f"in {time.monotonic() - started:.1f}s"
+            )
         )
+
+    def generate(self, label, total, make_batch):
+        created = 0
+        started = time.monotonic()
+        while created < total:
+            count = min(self.batch_size, total - created)
+            make_batch(count)
+            created += count
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f"{label}: {created}/{total} ({created / elapsed:.0f} rows/s)")
+
+    def random_moment(self):
+        day = self.rng.choices(self.days, cum_weights=self.day_weights)[0]
+        hour = self.rng.choices(range(24), cum_weights=self.hour_weights)[0]
+        moment = datetime.combine(day, day_time(hour))
+        moment += timedelta(seconds=self.rng.randrange(3600))
+        return timezone.make_aware(moment)
+
+    def pick(self, pool):
+        return self.rng.choice(self.pools[pool])
+
+    def request_batch(self, count):
+        rng = self.rng
+        requests = []
+        for _ in range(count):
+            creation_date = self.random_moment()
+            # Most buyers order within two weeks of their first visit
+            first_visit = creation_date - timedelta(seconds=int(rng.expovariate(1 / 86400) * 3))
+            state = state_for_age(rng, (self.today - timezone.localdate(creation_date)).days)
+            article = weighted(rng, ARTICLES)
+            quantity = weighted(rng, QUANTITIES)
+            requests.append(Request(
+                article=article,
+                name=self.pick("name"),
+                phone=self.pick("phone"),
+                city=rng.choice(CITIES),
+                description=self.pick("description"),
+                text=self.pick("text"),
+                color=weighted(rng, COLORS),
+                size=weighted(rng, SIZES) if article in ("t_shirt", "sweet_shirt") else "",
+                quantity=quantity,
+                price=PRICES[article] * quantity,
+                creation_date=creation_date,
+                submitted_date=creation_date,
+                state=state,
+                is_seen=state != "unseen",
+                is_delivered=state == "finished" and rng.random() < 0.9,
+                first_url=self.pick("url"),
+                last_url=self.pick("url"),
+                referrer=rng.choice(["https://www.google.com/", "https://www.facebook.com/", None]),
+                repetitions=min(int(rng.expovariate(2)), 10),
+                uuid=f"{int(first_visit.timestamp() * 1000)}-{rng.getrandbits(48):012x}",
+                first_visit=first_visit,
+                front_image=self.image_name(rng) if rng.random() < self.image_share else None,
+            ))
+        requests = Request.objects.bulk_create(requests)
+
+        pictures = [
+            Picture(request=request, image=self.image_name(rng))
+            for request in requests
+            if request.front_image and rng.random() < 0.5
+        ]
+        Picture.objects.bulk_create(pictures)
+
+    def image_name(self, rng):
+        # Content-addressed layout of StoredImage, without files behind it
+        digest = f"{rng.getrandbits(256):064x}"
+        return f"designs/{digest[:2]}/{digest}.png"
+
+    def contact_batch(self, count):
+        rng = self.rng
+        contacts = []
+        for _ in range(count):
+            timestamp = self.random_moment()
+            age = (self.today - timezone.localdate(timestamp)).days
+            contacts.append(Contact(
+                fullName=self.pick("name"),
+                email=self.pick("email"),
+                phoneNumber=self.pick("phone"),
+                message=self.pick("description"),
+                timestamp=timestamp,
+                read=age > 3 or rng.random() < 0.3,
+            ))
+        # auto_now_add stamps the rows with the current time on insert, the
+        # generated timestamps are written back afterwards
+        timestamps = [contact.timestamp for contact in contacts]
+        contacts = Contact.objects.bulk_create(contacts)
+        for contact, timestamp in zip(contacts, timestamps):
+            contact.timestamp = timestamp
+        Contact.objects.bulk_update(contacts, ["timestamp"], batch_size=TIMESTAMP_BATCH_SIZE)
@@ -0,0 +1,133 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max, Min, Q
+
+from main.models import Request, StoredImage
+from main.signals import requests_updated
+from main.utils import base64_to_image
+
+# Legacy base64 column -> storage-backed image field
+LEGACY_COLUMNS = {"frontImage": "front_image", "backImage": "back_image"}
+
+
+def migrate_row(pk):
+    """
+    Move the base64 blobs of one request to the storage and clear them.
+    Returns the number of base64 characters moved and whether it failed.
+    """
+    row = (
+        Request.objects.filter(pk=pk)
+        .values("frontImage", "backImage", "front_image", "back_image")
+        .first()
+    )
+    if row is None:
+        return 0, False
+
+    updates = {}
+    moved = 0
+    failed = False
+    for column, field in LEGACY_COLUMNS.items():
+        data = row[column]
+        if not data or data.startswith("http"):
+            # Nothing to move, or a URL rather than an encoded image
+            continue
+        if not row[field]:
+            slot = field.split("_")[0]
+            image = base64_to_image(data, f"{slot}_{pk}")
+            if image is None:
+                # Keep the blob so no design is lost
+                failed = True
+                continue
+            # The name carries the extension of the detected format
+            updates[field] = StoredImage.objects.acquire(image, image.name)
+        updates[column] = None
+        moved += len(data)
+
+    if updates:
+        # Only touch the image columns, the rest of the row may be edited live
+        Request.objects.filter(pk=pk).update(**updates)
+        requests_updated.send(sender=Request, ids=[pk], changes=updates)
+    return moved, failed
+
+
+def migrate_rows(pks):
+    """Worker task: migrate a slice of rows on this thread's own connection"""
+    try:
+        return [migrate_row(pk) for pk in pks]
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Move legacy base64 frontImage/backImage blobs to the file storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Width of each id range"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Rows decoded and uploaded in parallel"
+        )
+        parser.add_argument(
+            "--start-id", type=int, help="Resume from this id (printed after each batch)"
+        )
+        parser.add_argument("--end-id", type=int, help="Stop after this id")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        workers = options["workers"]
+        legacy = Request.objects.filter(
+            Q(frontImage__isnull=False) | Q(backImage__isnull=False)
+        )
+        bounds = legacy.aggregate(first=Min("id"), last=Max("id"))
+        if bounds["first"] is None:
+            self.stdout.write(self.style.SUCCESS("No legacy images left to migrate"))
+            return
+        first_id = max(bounds["first"], options["start_id"] or 0)
+        last_id = min(bounds["last"], options["end_id"] or bounds["last"])
+
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        started = time.monotonic()
+        migrated = failed = moved = 0
+        try:
+            for low in range(first_id, last_id + 1, batch_size):
+                high = min(low + batch_size - 1, last_id)
+                pks = list(
+                    legacy.filter(id__range=(low, high))
+                    .order_by("id")
+                    .values_list("id", flat=True)
+                )
+                if executor:
+                    slices = [pks[index::workers] for index in range(workers)]
+                    results = [
+                        result
+                        for results in executor.map(migrate_rows, slices)
+                        for result in results
+                    ]
+                else:
+                    results = [migrate_row(pk) for pk in pks]
+
+                for size, row_failed in results:
+                    moved += size
+                    failed += row_failed
+                    migrated += size > 0
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f"ids {low}-{high}: {migrated} rows migrated, {failed} failed, "
+                    f"{migrated / elapsed:.1f} rows/s, "
+                    f"{moved / elapsed / 1024 / 1024:.2f} MB/s "
+                    f"(resume with --start-id {high + 1})"
+                )
+        finally:
+            if executor:
+                executor.shutdown()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully migrated {migrated} rows "
+                f"({moved / 1024 / 1024:.1f} MB of base64) with {failed} failures"
+            )
+        )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from main.uploads import process_pending_uploads, run_upload_worker
+
+
+class Command(BaseCommand):
+    help = "Push deferred design images to the configured file storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true", help="Keep polling for new uploads"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5, help="Seconds between polls with --loop"
+        )
+        parser.add_argument("--limit", type=int, help="Stop after this many uploads")
+
+    def handle(self, *args, **options):
+        if options["loop"]:
+            run_upload_worker(options["interval"])
+            return
+        pushed, failed = process_pending_uploads(options["limit"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Pushed {pushed} uploads ({failed} failed)")
+        )
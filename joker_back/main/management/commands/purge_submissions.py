@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from main.idempotency import purge_submissions
+
+
+class Command(BaseCommand):
+    help = "Delete the order submission records too old to be replayed"
+
+    def handle(self, *args, **options):
+        deleted = purge_submissions()
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully purged {deleted} submissions")
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from main.statistics import rebuild_daily_statistics
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily statistics rollups from the requests table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start-date", help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument("--end-date", help="Last day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        days = rebuild_daily_statistics(options["start_date"], options["end_date"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully rebuilt statistics for {days} days")
+        )
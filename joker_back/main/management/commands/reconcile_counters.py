@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from main.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Check the badge counters against the real counts and repair any drift"
+
+    def handle(self, *args, **options):
+        drifted = reconcile_counters()
+        for name, (stored, real) in sorted(drifted.items()):
+            self.stdout.write(f"{name}: {stored} -> {real}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully reconciled counters, {len(drifted)} drifted")
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.6 on 2026-10-18 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_alter_picture_image_alter_request_backimage_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='back_image',
+            field=models.ImageField(blank=True, null=True, upload_to='order_designs/back'),
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='front_image',
+            field=models.ImageField(blank=True, null=True, upload_to='order_designs/front'),
+        ),
+    ]
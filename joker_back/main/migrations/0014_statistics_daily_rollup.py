@@ -0,0 +1,104 @@
+# Generated by Django 4.2.6 on 2026-10-18 02:58
+
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+# Frozen copy of the rollup aggregation as of this migration, so it keeps
+# working whatever later happens to main.statistics
+STATE_COUNTERS = {
+    "unseen_requests": "unseen",
+    "seen_requests": "seen",
+    "pending_requests": "pending",
+    "in_progress_requests": "progress",
+    "finished_requests": "finished",
+}
+
+
+def backfill_daily_rollups(apps, schema_editor):
+    """Roll up the existing requests, so the dashboard keeps its history"""
+    Request = apps.get_model("main", "Request")
+    Statistics = apps.get_model("main", "Statistics")
+    Statistics.objects.filter(finish_date=models.F("start_date")).delete()
+
+    aggregates = {"total_requests": models.Count("id")}
+    for field, state in STATE_COUNTERS.items():
+        aggregates[field] = models.Count("id", filter=models.Q(state=state))
+    aggregates["delivered_requests"] = models.Count(
+        "id", filter=models.Q(is_delivered=True)
+    )
+    aggregates["total_revenue"] = models.Sum(
+        "price", filter=models.Q(state__in=["finished", "delivered"])
+    )
+    aggregates["repetitions_count"] = models.Sum("repetitions")
+
+    requests = Request.objects.annotate(day=TruncDate("creation_date"))
+    article_counts = defaultdict(Counter)
+    color_counts = defaultdict(Counter)
+    breakdown = (
+        requests.values("day", "article", "color")
+        .annotate(count=models.Count("id"))
+        .order_by()
+    )
+    for row in breakdown:
+        article_counts[row["day"]][row["article"]] += row["count"]
+        color_counts[row["day"]][row["color"]] += row["count"]
+
+    rollups = []
+    for row in requests.values("day").annotate(**aggregates).order_by():
+        day = row.pop("day")
+        totals = {field: value or 0 for field, value in row.items()}
+        total = totals["total_requests"]
+        converted = totals["finished_requests"] + totals["delivered_requests"]
+        articles = dict(article_counts[day])
+        colors = dict(color_counts[day])
+        rollups.append(
+            Statistics(
+                start_date=day,
+                finish_date=day,
+                new_requests=total,
+                conversion_rate=converted / total * 100 if total else 0,
+                top_article=Counter(articles).most_common(1)[0][0] if articles else "",
+                top_color=Counter(colors).most_common(1)[0][0] if colors else "",
+                article_counts=articles,
+                color_counts=colors,
+                **totals,
+            )
+        )
+    Statistics.objects.bulk_create(rollups, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_request_back_image_request_front_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statistics',
+            name='article_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='statistics',
+            name='color_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='statistics',
+            name='pending_requests',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='statistics',
+            name='seen_requests',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='statistics',
+            constraint=models.UniqueConstraint(fields=('start_date', 'finish_date'), name='unique_statistics_range'),
+        ),
+        migrations.RunPython(backfill_daily_rollups, migrations.RunPython.noop),
+    ]
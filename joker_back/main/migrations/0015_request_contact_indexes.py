@@ -0,0 +1,69 @@
+# Generated by Django 4.2.6 on 2026-10-18 02:59
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.functions.datetime
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """
+    Build the index without locking out writes on PostgreSQL; other
+    databases, which have no CONCURRENTLY, get a plain CREATE INDEX.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('main', '0014_statistics_daily_rollup'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='contact',
+            index=models.Index(fields=['-timestamp', '-id'], name='contact_timestamp_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='contact',
+            index=models.Index(condition=models.Q(('read', False)), fields=['-timestamp'], name='contact_unread_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='request',
+            index=models.Index(fields=['-creation_date', '-id'], name='request_created_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='request',
+            index=models.Index(fields=['state', '-creation_date'], name='request_state_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='request',
+            index=models.Index(condition=models.Q(('state', 'unseen')), fields=['-creation_date'], name='request_unseen_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='request',
+            index=models.Index(fields=['is_delivered', '-creation_date'], name='request_delivered_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='request',
+            index=models.Index(django.db.models.functions.datetime.TruncDate('creation_date'), name='request_created_day_idx'),
+        ),
+    ]
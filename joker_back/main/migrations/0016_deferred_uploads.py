@@ -0,0 +1,32 @@
+# Generated by Django 4.2.6 on 2026-10-18 03:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import main.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_request_contact_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='upload_status',
+            field=models.CharField(choices=[('pending', 'pending'), ('complete', 'complete'), ('failed', 'failed')], default='complete', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='PendingUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.CharField(choices=[('front', 'front'), ('back', 'back')], max_length=10)),
+                ('file', models.FileField(storage=main.utils.local_storage, upload_to='upload_staging')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_uploads', to='main.request')),
+            ],
+        ),
+    ]
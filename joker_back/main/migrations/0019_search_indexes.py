@@ -0,0 +1,41 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Full-text GIN indexes behind ?q= (main.search). PostgreSQL only, so they
+# are created here rather than declared in the models' Meta.
+SEARCH_INDEXES = {
+    "Request": ("request_search_idx", ("name", "phone", "city", "description", "text")),
+    "Contact": ("contact_search_idx", ("fullName", "email", "phoneNumber", "message")),
+}
+
+
+def search_indexes(apps):
+    for model_name, (name, fields) in SEARCH_INDEXES.items():
+        index = GinIndex(SearchVector(*fields, config="simple"), name=name)
+        yield apps.get_model("main", model_name), index
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model, index in search_indexes(apps):
+        schema_editor.add_index(model, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model, index in search_indexes(apps):
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
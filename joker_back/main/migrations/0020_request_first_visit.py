@@ -0,0 +1,48 @@
+# Generated by Django 4.2.6 on 2026-10-18 03:19
+
+from django.db import migrations, models
+
+from main.utils import uuid_to_date
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_first_visit(apps, schema_editor):
+    """Parse the visitor uuid of the existing requests, one batch at a time"""
+    Request = apps.get_model('main', 'Request')
+    rows = (
+        Request.objects.filter(uuid__isnull=False, first_visit__isnull=True)
+        .only('id', 'uuid')
+        .order_by('id')
+        .iterator(chunk_size=BACKFILL_BATCH_SIZE)
+    )
+    batch = []
+    for request in rows:
+        request.first_visit = uuid_to_date(request.uuid)
+        if request.first_visit:
+            batch.append(request)
+        if len(batch) == BACKFILL_BATCH_SIZE:
+            Request.objects.bulk_update(batch, ['first_visit'])
+            batch = []
+    if batch:
+        Request.objects.bulk_update(batch, ['first_visit'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='first_visit',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['first_visit'], name='request_first_visit_idx'),
+        ),
+        migrations.RunPython(backfill_first_visit, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_submissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statistics',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
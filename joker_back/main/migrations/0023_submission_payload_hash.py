@@ -0,0 +1,18 @@
+# Generated by Django 4.2.6 on 2026-10-18 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_statistics_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='payload_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 04:03
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_submission_payload_hash'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='statistics',
+            name='version',
+        ),
+    ]
@@ -1,11 +1,19 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import TruncDate
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 from django.utils import timezone
-from main.utils import uuid_to_date, generate_unique_filename
+from main.utils import (
+    content_addressed_filename,
+    content_hash,
+    generate_unique_filename,
+    local_storage,
+    uuid_to_date,
+)
 
 
 class CustomUserManager(BaseUserManager):
@@ -63,6 +71,11 @@ class Request(models.Model):
         ("progress", "progress"),
         ("finished", "finished"),
     ]
+    upload_status_choices = [
+        ("pending", "pending"),
+        ("complete", "complete"),
+        ("failed", "failed"),
+    ]
     article = models.CharField(max_length=255, choices=article_choices, default="")
     description = models.TextField(default="", blank=True, null=True)
     phone = models.CharField(max_length=255, blank=True)
@@ -91,13 +104,53 @@ class Request(models.Model):
     referrer = models.TextField(null=True, blank=True)
     repetitions = models.PositiveIntegerField(default=0)
     uuid = models.CharField(max_length=255, blank=True, null=True)
+    # Parsed from the uuid on save, so visits can be filtered and aggregated in SQL
+    first_visit = models.DateTimeField(blank=True, null=True)
     price = models.PositiveIntegerField(default=0)
+    # "pending" while the deferred upload worker still holds the design images
+    upload_status = models.CharField(
+        max_length=20, choices=upload_status_choices, default="complete"
+    )
+
+    class Meta:
+        indexes = [
+            # Default list ordering, with id as tie-breaker
+            models.Index(fields=["-creation_date", "-id"], name="request_created_idx"),
+            # unseen/pending/progress/finished filters
+            models.Index(fields=["state", "-creation_date"], name="request_state_idx"),
+            # The admin badge only ever looks for unseen requests
+            models.Index(
+                fields=["-creation_date"],
+                condition=models.Q(state="unseen"),
+                name="request_unseen_idx",
+            ),
+            models.Index(
+                fields=["is_delivered", "-creation_date"], name="request_delivered_idx"
+            ),
+            # creation_date__date lookups used by the statistics
+            models.Index(TruncDate("creation_date"), name="request_created_day_idx"),
+            models.Index(fields=["first_visit"], name="request_first_visit_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if "uuid" not in self.get_deferred_fields() and (
+            update_fields is None or "uuid" in update_fields
+        ):
+            self.first_visit = uuid_to_date(self.uuid)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "first_visit"}
+        # Keep the counters adjusted by the signals in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     @property
     def first_visit_date(self):
-        if not self.uuid or "-" not in self.uuid:
-            return "-"
-        return uuid_to_date(self.uuid)
+        return self.first_visit or "-"
 
 
 class Picture(models.Model):
@@ -111,12 +164,76 @@ class Picture(models.Model):
     )
 
 
+class StoredImageManager(models.Manager):
+    def acquire(self, content, filename):
+        """
+        Store the bytes once and return the shared file name. Identical
+        content is only uploaded the first time and then referenced.
+        """
+        digest = content_hash(content)
+        if self.filter(sha256=digest).update(ref_count=models.F("ref_count") + 1):
+            return self.filter(sha256=digest).values_list("file", flat=True).get()
+
+        stored = self.model(sha256=digest, size=content.size, ref_count=1)
+        stored.file.save(content_addressed_filename(digest, filename), content, save=False)
+        try:
+            with transaction.atomic():
+                stored.save()
+        except IntegrityError:
+            # The same bytes were stored concurrently, keep the other copy
+            stored.file.delete(save=False)
+            return self.acquire(content, filename)
+        return stored.file.name
+
+    def retain(self, name):
+        """Count one more reference to an already stored file"""
+        self.filter(file=name).update(ref_count=models.F("ref_count") + 1)
+
+    def release(self, *names):
+        """Drop one reference per name; unreferenced files are removed by cleanup"""
+        for name in names:
+            if name:
+                self.filter(file=name, ref_count__gt=0).update(
+                    ref_count=models.F("ref_count") - 1
+                )
+
+
+class StoredImage(models.Model):
+    """Design image bytes stored once, keyed by their SHA-256."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to="designs", max_length=255, db_index=True)
+    size = models.PositiveIntegerField(default=0)
+    # Number of Request/Picture image fields pointing at this file
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    objects = StoredImageManager()
+
+
+class PendingUpload(models.Model):
+    """A design image kept locally until the upload worker pushes it to storage."""
+    slot_choices = [
+        ("front", "front"),
+        ("back", "back"),
+    ]
+    request = models.ForeignKey(
+        Request, on_delete=models.CASCADE, related_name="pending_uploads"
+    )
+    slot = models.CharField(max_length=10, choices=slot_choices)
+    file = models.FileField(upload_to="upload_staging", storage=local_storage)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
 class Statistics(models.Model):
+    """Daily rollup of requests created on one day (start_date == finish_date)."""
     start_date = models.DateField(default=timezone.now)
     finish_date = models.DateField(default=timezone.now)
     total_requests = models.PositiveIntegerField(default=0)
     new_requests = models.PositiveIntegerField(default=0)
     unseen_requests = models.PositiveIntegerField(default=0)
+    seen_requests = models.PositiveIntegerField(default=0)
+    pending_requests = models.PositiveIntegerField(default=0)
     in_progress_requests = models.PositiveIntegerField(default=0)
     finished_requests = models.PositiveIntegerField(default=0)
     delivered_requests = models.PositiveIntegerField(default=0)
@@ -125,6 +242,16 @@ class Statistics(models.Model):
     repetitions_count = models.PositiveIntegerField(default=0)
     top_article = models.CharField(max_length=255, default="")
     top_color = models.CharField(max_length=255, default="")
+    # Per-value counts so top article/color can be merged across days
+    article_counts = models.JSONField(default=dict, blank=True)
+    color_counts = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["start_date", "finish_date"], name="unique_statistics_range"
+            ),
+        ]
 
 
 class Contact(models.Model):
@@ -135,6 +262,51 @@ class Contact(models.Model):
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-timestamp", "-id"], name="contact_timestamp_idx"),
+            models.Index(
+                fields=["-timestamp"],
+                condition=models.Q(read=False),
+                name="contact_unread_idx",
+            ),
+        ]
     
+    def save(self, *args, **kwargs):
+        # Keep the counters adjusted by the signals in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
-        return f"Contact from {self.fullName} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"Contact from {self.fullName} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+
+class Counter(models.Model):
+    """Badge count kept in step with the rows it counts (see main.counters)."""
+    name = models.CharField(max_length=64, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class Submission(models.Model):
+    """
+    Idempotency record of an order submission: the Idempotency-Key header,
+    or the visitor uuid plus a payload hash, and the response sent for it.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    # Hash of the first payload; a replay must carry the same one
+    payload_hash = models.CharField(max_length=64, blank=True, default="")
+    # Empty while the first submission is still being processed
+    request = models.ForeignKey(
+        Request, on_delete=models.CASCADE, related_name="submissions", null=True, blank=True
+    )
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
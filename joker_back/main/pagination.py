@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULT_PAGE_SIZE = 20
+COUNT_CACHE_TIMEOUT = 60  # seconds
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(position, backwards=False):
+    """Turn an (ordering value, id) position into an opaque cursor string"""
+    key, pk = position
+    payload = {"k": key.isoformat(), "i": pk, "b": backwards}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        key = parse_datetime(payload["k"])
+        pk = int(payload["i"])
+        backwards = bool(payload.get("b", False))
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if key is None:
+        raise InvalidCursor(cursor)
+    return (key, pk), backwards
+
+
+def cached_count(queryset):
+    """Exact count, cached for a short while per query"""
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    key = "count:" + hashlib.md5(f"{sql}{params}".encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def estimated_count(queryset):
+    """Row count estimated from the PostgreSQL planner statistics"""
+    if connection.vendor != "postgresql":
+        return cached_count(queryset)
+    queryset = queryset.order_by()
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 until the table has been analyzed
+        if row and row[0] >= 0:
+            return row[0]
+    plan = json.loads(queryset.explain(format="json"))
+    return plan[0]["Plan"]["Plan Rows"]
+
+
+COUNT_MODES = {
+    "exact": cached_count,
+    "estimate": estimated_count,
+}
+
+
+def keyset_queryset(queryset, field, position=None, backwards=False):
+    """
+    Order ``queryset`` by (field, id) and restrict it to the rows after
+    ``position`` in that order.
+    """
+    if position:
+        key, pk = position
+        lookup = "gt" if backwards else "lt"
+        # The redundant inclusive bound gives the planner an index range to
+        # scan; the OR alone is not sargable.
+        queryset = queryset.filter(
+            Q(**{f"{field}__{lookup}e": key}),
+            Q(**{f"{field}__{lookup}": key}) | Q(**{field: key, f"id__{lookup}": pk}),
+        )
+    if backwards:
+        return queryset.order_by(field, "id")
+    return queryset.order_by(f"-{field}", "-id")
+
+
+def keyset_page(queryset, field, page_size, cursor=None):
+    """
+    Return one page ordered by (field, id) descending, with the cursors of
+    the neighbouring pages. Each page is a single indexed range query,
+    whatever its depth.
+    """
+    position, backwards = decode_cursor(cursor) if cursor else (None, False)
+    queryset = keyset_queryset(queryset, field, position, backwards)
+
+    rows = list(queryset[: page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor((getattr(rows[-1], field), rows[-1].pk))
+        if (has_more and backwards) or (position and not backwards):
+            previous_cursor = encode_cursor(
+                (getattr(rows[0], field), rows[0].pk), backwards=True
+            )
+    return rows, next_cursor, previous_cursor
+
+
+def paginated_response(view, queryset, field):
+    """
+    Paginate a list endpoint.
+
+    With a ``cursor`` query parameter (empty for the first page) pages are
+    keyed on (field, id) and the total is only computed when ``count`` is
+    ``exact`` (cached) or ``estimate`` (planner statistics). Otherwise the
+    classic ``page``/``page_size`` contract applies.
+    """
+    params = view.request.query_params
+    page_size = int(params.get("page_size", DEFAULT_PAGE_SIZE))
+
+    if "cursor" in params:
+        try:
+            rows, next_cursor, previous_cursor = keyset_page(
+                queryset, field, page_size, params.get("cursor")
+            )
+        except InvalidCursor:
+            return Response(
+                {"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        data = {
+            "results": view.get_serializer(rows, many=True).data,
+            "next": next_cursor,
+            "previous": previous_cursor,
+        }
+        count_mode = COUNT_MODES.get(params.get("count"))
+        if count_mode:
+            data["count"] = count_mode(queryset)
+        return Response(data)
+
+    page = int(params.get("page", 1))
+    start = (page - 1) * page_size
+    end = page * page_size
+
+    total_count = queryset.count()
+    serializer = view.get_serializer(queryset[start:end], many=True)
+    return Response({
+        "results": serializer.data,
+        "count": total_count,
+        "page": page,
+        "total_pages": (total_count + page_size - 1) // page_size,
+    })
@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib json module is used instead
+    orjson = None
+
+
+def dumps(data):
+    """Compact UTF-8 JSON, through orjson when it is installed"""
+    if orjson is None:
+        return json.dumps(data, cls=encoders.JSONEncoder, ensure_ascii=False).encode()
+    # Leave datetimes to DRF's encoder so both paths format them alike
+    return orjson.dumps(
+        data,
+        default=encoders.JSONEncoder().default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer serializing through orjson. Indented output (browsable API,
+    `; indent=` media type parameter) still goes through the stdlib.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Render a list of objects as newline-delimited JSON, one object per line"""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, dict):
+            data = [data]
+        return b"".join(dumps(item) + b"\n" for item in data)
+
+
+# Leading characters that make spreadsheets read a cell as a formula
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        # Customer input: quote it so it is shown as text, never evaluated
+        return "'" + value
+    return value
+
+
+class CSVRenderer(BaseRenderer):
+    """Render a list of flat objects as CSV, with a header row"""
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render_rows(self, rows, header=None):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(header)
+        writer.writerows([csv_value(value) for value in row] for row in rows)
+        return buffer.getvalue().encode()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not data:
+            return b""
+        if isinstance(data, dict):
+            data = [data]
+        header = list(data[0])
+        return self.render_rows(([row.get(name) for name in header] for row in data), header)
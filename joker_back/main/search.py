@@ -0,0 +1,71 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Q
+from rest_framework.filters import BaseFilterBackend
+
+# Columns covered by ?q=, matching the GIN indexes of migration 0019
+REQUEST_SEARCH_FIELDS = ("name", "phone", "city", "description", "text")
+CONTACT_SEARCH_FIELDS = ("fullName", "email", "phoneNumber", "message")
+
+# Language-neutral: names, phones and Arabic/French/English text alike
+SEARCH_CONFIG = "simple"
+
+
+def search_vector(fields):
+    """The indexed expression; queries must build it identically to use the index"""
+    return SearchVector(*fields, config=SEARCH_CONFIG)
+
+
+def rank_vector(fields):
+    """Matches in the first field (the name) rank above the others"""
+    return SearchVector(fields[0], weight="A", config=SEARCH_CONFIG) + SearchVector(
+        *fields[1:], weight="D", config=SEARCH_CONFIG
+    )
+
+
+def search_terms(q):
+    return re.findall(r"\w+", q or "")
+
+
+def search(queryset, fields, q):
+    """
+    Filter a queryset on every word of q (prefix match). On PostgreSQL the
+    match uses the tsvector GIN index and results are ranked, name matches
+    first; elsewhere it
+    falls back to icontains and keeps the queryset ordering.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return queryset
+    if connection.vendor != "postgresql":
+        for term in terms:
+            matches = Q()
+            for field in fields:
+                matches |= Q(**{f"{field}__icontains": term})
+            queryset = queryset.filter(matches)
+        return queryset
+
+    vector = search_vector(fields)
+    query = SearchQuery(
+        " & ".join(f"{term}:*" for term in terms), config=SEARCH_CONFIG, search_type="raw"
+    )
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    return (
+        queryset.alias(search=vector, search_rank=SearchRank(rank_vector(fields), query))
+        .filter(search=query)
+        .order_by("-search_rank", *ordering)
+    )
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """?q= search over the view's `search_fields`"""
+    search_param = "q"
+
+    def filter_queryset(self, request, queryset, view):
+        q = request.query_params.get(self.search_param)
+        fields = getattr(view, "search_fields", None)
+        if not q or not fields:
+            return queryset
+        return search(queryset, fields, q)
@@ -1,6 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 from rest_framework.permissions import AllowAny
-from .models import User, Request, Contact
+from .models import User, Request, Contact, Picture
+from .uploads import attach_image, stage_uploads
 from .utils import base64_to_image, generate_unique_filename
 
 
@@ -9,7 +11,18 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = "__all__"
 
-class RequestSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """Takes an optional `fields` argument restricting the fields rendered"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class RequestSerializer(DynamicFieldsModelSerializer):
     # File upload fields - these will override model fields with the same name
     front_image = serializers.ImageField(required=False)
     back_image = serializers.ImageField(required=False)
@@ -21,6 +34,7 @@ class RequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = Request
         fields = "__all__"
+        read_only_fields = ("upload_status",)
         
     def get_front_image_url(self, obj):
         # Return the URL if the image exists
@@ -35,12 +49,15 @@ class RequestSerializer(serializers.ModelSerializer):
         # Return the URL if the image exists
         if obj.back_image and hasattr(obj.back_image, 'url'):
             return obj.back_image.url
-        # Fallback to checking related pictures
-        pictures = obj.pictures.all()
-        if pictures.exists():
-            picture = pictures.first()
-            if picture.image and hasattr(picture.image, 'url'):
-                return picture.image.url
+        # Fallback to the first related picture. List and detail querysets
+        # annotate its file name so no query is needed per row.
+        if hasattr(obj, 'fallback_picture'):
+            picture_name = obj.fallback_picture
+        else:
+            picture = obj.pictures.order_by('pk').first()
+            picture_name = picture.image.name if picture else None
+        if picture_name:
+            return Picture._meta.get_field('image').storage.url(picture_name)
         return None
         
     def create(self, validated_data):
@@ -55,70 +72,29 @@ class RequestSerializer(serializers.ModelSerializer):
         # Create the request object
         request = Request.objects.create(**validated_data)
         
-        # Process front image file if provided
-        if front_image:
-            try:
-                # Make sure the file isn't already read/consumed
-                if hasattr(front_image, 'seek') and callable(front_image.seek):
-                    front_image.seek(0)
-                # Save the file directly to the front_image field (Cloudinary)
-                request.front_image.save(f'front_design_{request.id}.png', front_image, save=True)
-            except Exception as e:
-                print(f"Error saving front image: {e}")
-        # Fallback to base64 data if file not provided
-        elif front_image_data:
-            try:
-                front_image_file = base64_to_image(front_image_data, f'front_{request.id}')
-                if front_image_file:
-                    request.front_image.save(f'front_design_{request.id}.png', front_image_file, save=True)
-                    request.frontImage = None  # Remove base64 data to save space
-            except Exception as e:
-                print(f"Error processing base64 front image: {e}")
-        
-        # Process back image file if provided
-        if back_image:
-            try:
-                # Make sure the file isn't already read/consumed
-                if hasattr(back_image, 'seek') and callable(back_image.seek):
-                    back_image.seek(0)
-                # Save the file directly to the back_image field (Cloudinary)
-                request.back_image.save(f'back_design_{request.id}.png', back_image, save=True)
-                
-                # Also create a Picture instance for backward compatibility
-                from .models import Picture
-                picture = Picture()
-                picture.request = request
-                
-                # Make a fresh copy of the file for the Picture model
-                if hasattr(back_image, 'seek') and callable(back_image.seek):
-                    back_image.seek(0)
-                    
-                picture.image.save(f'back_design_{request.id}.png', back_image, save=True)
-            except Exception as e:
-                print(f"Error saving back image: {e}")
-        # Fallback to base64 data if file not provided
-        elif back_image_data:
+        # Fallback to base64 data if a file was not provided
+        if not front_image and front_image_data:
+            front_image = base64_to_image(front_image_data, f'front_{request.id}')
+        if not back_image and back_image_data:
+            back_image = base64_to_image(back_image_data, f'back_{request.id}')
+
+        images = {'front': front_image, 'back': back_image}
+        images = {slot: image for slot, image in images.items() if image}
+
+        if images and settings.DEFERRED_IMAGE_UPLOADS:
+            # Answer right away, the upload worker pushes the files later
+            stage_uploads(request, images)
+            return request
+
+        for slot, image in images.items():
             try:
-                back_image_file = base64_to_image(back_image_data, f'back_{request.id}')
-                if back_image_file:
-                    request.back_image.save(f'back_design_{request.id}.png', back_image_file, save=True)
-                    
-                    # Create a Picture instance for backward compatibility
-                    from .models import Picture
-                    picture = Picture()
-                    picture.request = request
-                    
-                    # Create a fresh copy of the file for the Picture model
-                    if hasattr(back_image_file, 'seek') and callable(back_image_file.seek):
-                        back_image_file.seek(0)
-                        
-                    picture.image.save(f'back_design_{request.id}.png', back_image_file, save=True)
-                    request.backImage = None  # Remove base64 data to save space
+                # Save the file directly to the image field (Cloudinary)
+                attach_image(request, slot, image)
             except Exception as e:
-                print(f"Error processing base64 back image: {e}")
-        
-        # Save the request with all updates
-        request.save()
+                print(f"Error saving {slot} image: {e}")
+
+        # Save the request with all updates in one go
+        request.save(update_fields=[f'{slot}_image' for slot in images])
         return request
 
 class StatisticsSerializer(serializers.Serializer):
@@ -0,0 +1,245 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .counters import (
+    CONTACTS_SEQUENCE,
+    REQUESTS_SEQUENCE,
+    UNREAD_CONTACTS,
+    adjust_counters,
+    request_counter,
+    transition_deltas,
+)
+from .events import publish_event
+from .models import Contact, Picture, Request, StoredImage
+from .statistics import refresh_daily_statistics
+
+# Sent after queryset updates that bypass save(), with the updated `ids`, the
+# `changes` applied and, when known, the `previous` rows (id, state,
+# creation_date) as they were before the update or just their
+# `previous_states` ({id: state}).
+requests_updated = Signal()
+
+# Request fields that feed the daily statistics rollup
+ROLLUP_SOURCE_FIELDS = (
+    "creation_date",
+    "state",
+    "is_delivered",
+    "price",
+    "repetitions",
+    "article",
+    "color",
+)
+
+
+def _rollup_day(value):
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        return value.date()
+    return timezone.localdate(value)
+
+
+def _snapshot(instance):
+    return {field: instance.__dict__.get(field) for field in ROLLUP_SOURCE_FIELDS}
+
+
+def _schedule_rollup_refresh(days):
+    """
+    Refresh the rollups of `days` once the transaction commits. The days of
+    every save share one pending set: the first callback to run refreshes
+    them all in one pass, the later ones find nothing left to do.
+    """
+    days = {day for day in days if day is not None}
+    if not days:
+        return
+    connection = transaction.get_connection()
+    pending = getattr(connection, "_pending_rollup_days", None)
+    if pending is None:
+        pending = connection._pending_rollup_days = set()
+    pending.update(days)
+
+    def refresh():
+        if pending:
+            days = set(pending)
+            pending.clear()
+            refresh_daily_statistics(days)
+
+    # Robust: the request is committed, a failed refresh must not
+    # turn its response into an error (rebuild_statistics repairs it)
+    transaction.on_commit(refresh, robust=True)
+
+
+@receiver(post_init, sender=Request)
+def remember_rollup_fields(sender, instance, **kwargs):
+    instance._rollup_snapshot = _snapshot(instance)
+
+
+@receiver(post_save, sender=Request)
+def update_rollup_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(ROLLUP_SOURCE_FIELDS):
+        return
+    previous = instance._rollup_snapshot
+    current = _snapshot(instance)
+    if created or previous != current:
+        _schedule_rollup_refresh(
+            {
+                _rollup_day(previous["creation_date"]),
+                _rollup_day(current["creation_date"]),
+            }
+        )
+    instance._rollup_snapshot = current
+
+
+@receiver(post_delete, sender=Request)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    _schedule_rollup_refresh({_rollup_day(instance.creation_date)})
+
+
+@receiver(requests_updated, sender=Request)
+def update_rollup_on_bulk_update(sender, ids, changes, previous=None, **kwargs):
+    if not set(changes) & set(ROLLUP_SOURCE_FIELDS):
+        return
+    if previous is not None:
+        _schedule_rollup_refresh({_rollup_day(row["creation_date"]) for row in previous})
+        return
+
+    def refresh():
+        creation_dates = Request.objects.filter(id__in=ids).values_list(
+            "creation_date", flat=True
+        )
+        refresh_daily_statistics({_rollup_day(value) for value in creation_dates})
+
+    transaction.on_commit(refresh, robust=True)
+
+
+@receiver(post_delete, sender=Request)
+def release_request_images(sender, instance, **kwargs):
+    StoredImage.objects.release(instance.front_image.name, instance.back_image.name)
+
+
+@receiver(post_delete, sender=Picture)
+def release_picture_image(sender, instance, **kwargs):
+    StoredImage.objects.release(instance.image.name)
+
+
+@receiver(post_save, sender=Request)
+def publish_request_event(sender, instance, created, **kwargs):
+    if created:
+        publish_event("request.created", {
+            "id": instance.id,
+            "state": instance.state,
+            "article": instance.article,
+            "creation_date": instance.creation_date,
+        })
+        return
+    previous_state = instance._event_state
+    if previous_state != instance.state:
+        publish_event("request.state_changed", {
+            "id": instance.id,
+            "state": instance.state,
+            "previous_state": previous_state,
+        })
+    instance._event_state = instance.state
+
+
+@receiver(post_init, sender=Request)
+def remember_event_state(sender, instance, **kwargs):
+    instance._event_state = instance.__dict__.get("state")
+
+
+def _previous_states(previous, previous_states):
+    if previous_states is not None:
+        return previous_states
+    return {row["id"]: row["state"] for row in previous or []}
+
+
+@receiver(requests_updated, sender=Request)
+def publish_bulk_state_events(sender, ids, changes, previous=None, previous_states=None, **kwargs):
+    if "state" not in changes:
+        return
+    previous_states = _previous_states(previous, previous_states)
+    for pk in ids:
+        publish_event("request.state_changed", {
+            "id": pk,
+            "state": changes["state"],
+            "previous_state": previous_states.get(pk),
+        })
+
+
+@receiver(post_save, sender=Contact)
+def publish_contact_event(sender, instance, created, **kwargs):
+    if created:
+        publish_event("contact.created", {
+            "id": instance.id,
+            "fullName": instance.fullName,
+            "timestamp": instance.timestamp,
+        })
+
+
+@receiver(post_init, sender=Request)
+def remember_counted_state(sender, instance, **kwargs):
+    instance._counted_state = instance.__dict__.get("state") if instance.pk else None
+
+
+@receiver(post_save, sender=Request)
+def count_request_on_save(sender, instance, created, **kwargs):
+    deltas = {REQUESTS_SEQUENCE: 1}
+    if created:
+        deltas[request_counter(instance.state)] = 1
+    elif instance._counted_state is not None:
+        deltas.update(transition_deltas([instance._counted_state], instance.state))
+    adjust_counters(deltas)
+    instance._counted_state = instance.state
+
+
+@receiver(pre_delete, sender=Request)
+def lock_counted_state(sender, instance, **kwargs):
+    # The instance may predate a queryset update, count the stored state
+    instance._counted_state = (
+        Request.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list("state", flat=True)
+        .first()
+    )
+
+
+@receiver(post_delete, sender=Request)
+def count_request_on_delete(sender, instance, **kwargs):
+    deltas = {REQUESTS_SEQUENCE: 1}
+    if instance._counted_state is not None:
+        deltas[request_counter(instance._counted_state)] = -1
+    adjust_counters(deltas)
+
+
+@receiver(requests_updated, sender=Request)
+def count_bulk_update(sender, ids, changes, previous=None, previous_states=None, **kwargs):
+    deltas = {REQUESTS_SEQUENCE: 1}
+    if "state" in changes:
+        previous_states = _previous_states(previous, previous_states)
+        deltas.update(transition_deltas(previous_states.values(), changes["state"]))
+    adjust_counters(deltas)
+
+
+@receiver(post_init, sender=Contact)
+def remember_counted_read(sender, instance, **kwargs):
+    instance._counted_read = instance.__dict__.get("read") if instance.pk else None
+
+
+@receiver(post_save, sender=Contact)
+def count_contact_on_save(sender, instance, created, **kwargs):
+    deltas = {CONTACTS_SEQUENCE: 1}
+    previous = True if created else instance._counted_read
+    if previous is not None and previous != instance.read:
+        deltas[UNREAD_CONTACTS] = 1 if previous else -1
+    adjust_counters(deltas)
+    instance._counted_read = instance.read
+
+
+@receiver(post_delete, sender=Contact)
+def count_contact_on_delete(sender, instance, **kwargs):
+    deltas = {CONTACTS_SEQUENCE: 1}
+    if not (instance.read if instance._counted_read is None else instance._counted_read):
+        deltas[UNREAD_CONTACTS] = -1
+    adjust_counters(deltas)
@@ -0,0 +1,286 @@
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+
+from .counters import (
+    STATISTICS_HISTORY_SEQUENCE,
+    STATISTICS_SEQUENCE,
+    adjust_counters,
+    counter_values,
+)
+from .models import Request, Statistics
+
+# Statistics column -> Request state it counts
+STATE_COUNTERS = {
+    "unseen_requests": "unseen",
+    "seen_requests": "seen",
+    "pending_requests": "pending",
+    "in_progress_requests": "progress",
+    "finished_requests": "finished",
+}
+
+COUNTER_FIELDS = (
+    "total_requests",
+    *STATE_COUNTERS,
+    "delivered_requests",
+    "total_revenue",
+    "repetitions_count",
+)
+
+# Counter store sequences the cached range results are keyed on: ranges
+# including today on every rollup write, closed ones on writes to past days
+# only. Keys are never stale, the timeouts free the entries left behind.
+RANGE_SEQUENCES = (STATISTICS_SEQUENCE, STATISTICS_HISTORY_SEQUENCE)
+OPEN_RANGE_CACHE_TIMEOUT = 60
+CLOSED_RANGE_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Longest date range a statistics request may cover
+MAX_RANGE_DAYS = 3660
+
+# Bucket sizes of the statistics series, and the most buckets per series
+SERIES_INTERVALS = ("day", "week", "month")
+MAX_SERIES_BUCKETS = 400
+
+ROLLUP_FIELDS = (
+    *COUNTER_FIELDS,
+    "new_requests",
+    "conversion_rate",
+    "top_article",
+    "top_color",
+    "article_counts",
+    "color_counts",
+)
+
+
+class RangeTooLong(Exception):
+    pass
+
+
+def request_aggregates():
+    """Conditional aggregates computing every counter in a single query"""
+    aggregates = {"total_requests": Count("id")}
+    for field, state in STATE_COUNTERS.items():
+        aggregates[field] = Count("id", filter=Q(state=state))
+    aggregates["delivered_requests"] = Count("id", filter=Q(is_delivered=True))
+    aggregates["total_revenue"] = Sum(
+        "price", filter=Q(state__in=["finished", "delivered"])
+    )
+    aggregates["repetitions_count"] = Sum("repetitions")
+    return aggregates
+
+
+def conversion_rate(totals):
+    if not totals["total_requests"]:
+        return 0
+    return (
+        (totals["finished_requests"] + totals["delivered_requests"])
+        / totals["total_requests"]
+        * 100
+    )
+
+
+def top_value(counts):
+    return Counter(counts).most_common(1)[0][0] if counts else ""
+
+
+def _daily_rollups(requests):
+    """Build unsaved rollup rows per creation day from a Request queryset"""
+    requests = requests.annotate(day=TruncDate("creation_date"))
+    rollups = {}
+    for row in requests.values("day").annotate(**request_aggregates()).order_by():
+        day = row.pop("day")
+        rollup = Statistics(start_date=day, finish_date=day)
+        for field in COUNTER_FIELDS:
+            setattr(rollup, field, row[field] or 0)
+        rollup.new_requests = rollup.total_requests
+        rollups[day] = rollup
+
+    article_counts = defaultdict(Counter)
+    color_counts = defaultdict(Counter)
+    breakdown = (
+        requests.values("day", "article", "color")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    for row in breakdown:
+        article_counts[row["day"]][row["article"]] += row["count"]
+        color_counts[row["day"]][row["color"]] += row["count"]
+
+    for day, rollup in rollups.items():
+        rollup.article_counts = dict(article_counts[day])
+        rollup.color_counts = dict(color_counts[day])
+        rollup.top_article = top_value(rollup.article_counts)
+        rollup.top_color = top_value(rollup.color_counts)
+        rollup.conversion_rate = conversion_rate(
+            {field: getattr(rollup, field) for field in COUNTER_FIELDS}
+        )
+    return rollups
+
+
+def _bump_sequences(days=None):
+    """Record a write to the rollups of the days, or of the whole history"""
+    deltas = {STATISTICS_SEQUENCE: 1}
+    if days is None or min(days) < timezone.localdate():
+        deltas[STATISTICS_HISTORY_SEQUENCE] = 1
+    adjust_counters(deltas)
+
+
+def refresh_daily_statistics(days):
+    """Recompute the rollup rows of the given days from their requests"""
+    days = {day for day in days if day is not None}
+    if not days:
+        return
+    with transaction.atomic():
+        # Lock the days' rows before aggregating: a concurrent refresh of
+        # the same day waits, then aggregates after ours has committed, so
+        # an older snapshot can never overwrite a newer one
+        Statistics.objects.bulk_create(
+            [Statistics(start_date=day, finish_date=day) for day in days],
+            ignore_conflicts=True,
+        )
+        list(
+            Statistics.objects.select_for_update()
+            .filter(start_date__in=days, finish_date=F("start_date"))
+            .order_by("start_date")
+            .values_list("id", flat=True)
+        )
+        rollups = _daily_rollups(Request.objects.filter(creation_date__date__in=days))
+        Statistics.objects.bulk_create(
+            rollups.values(),
+            update_conflicts=True,
+            unique_fields=["start_date", "finish_date"],
+            update_fields=ROLLUP_FIELDS,
+        )
+        Statistics.objects.filter(
+            start_date__in=days - rollups.keys(), finish_date=F("start_date")
+        ).delete()
+        _bump_sequences(days)
+
+
+def rebuild_daily_statistics(start_date=None, end_date=None):
+    """Rebuild the rollup rows for a date range, or the whole history"""
+    requests = Request.objects.all()
+    existing = Statistics.objects.filter(finish_date=F("start_date"))
+    if start_date:
+        requests = requests.filter(creation_date__date__gte=start_date)
+        existing = existing.filter(start_date__gte=start_date)
+    if end_date:
+        requests = requests.filter(creation_date__date__lte=end_date)
+        existing = existing.filter(start_date__lte=end_date)
+
+    rollups = _daily_rollups(requests)
+    with transaction.atomic():
+        existing.delete()
+        Statistics.objects.bulk_create(rollups.values(), batch_size=500)
+        _bump_sequences()
+    return len(rollups)
+
+
+def range_statistics(start_date, end_date):
+    """Combine the daily rollups of a date range into one summary"""
+    rollups = Statistics.objects.filter(
+        start_date__range=[start_date, end_date], finish_date=F("start_date")
+    ).values(*COUNTER_FIELDS, "article_counts", "color_counts")
+
+    totals = dict.fromkeys(COUNTER_FIELDS, 0)
+    article_counts = Counter()
+    color_counts = Counter()
+    for rollup in rollups:
+        for field in COUNTER_FIELDS:
+            totals[field] += rollup[field]
+        article_counts.update(rollup["article_counts"])
+        color_counts.update(rollup["color_counts"])
+
+    return {
+        **totals,
+        "conversion_rate": conversion_rate(totals),
+        "top_article": top_value(article_counts),
+        "top_color": top_value(color_counts),
+    }
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def cached_range_statistics(start_date, end_date, sequences=None):
+    """
+    range_statistics memoized per date range, keyed on the RANGE_SEQUENCES
+    values (read unless given, e.g. by the ETag of the view). Raises
+    RangeTooLong beyond MAX_RANGE_DAYS.
+    """
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    if (end_date - start_date).days >= MAX_RANGE_DAYS:
+        raise RangeTooLong(MAX_RANGE_DAYS)
+    if start_date > end_date:
+        return range_statistics(start_date, end_date)
+    current, history = sequences or counter_values(*RANGE_SEQUENCES)
+    if end_date < timezone.localdate():
+        key = f"statistics:range:{start_date}:{end_date}:h{history}"
+        timeout = CLOSED_RANGE_CACHE_TIMEOUT
+    else:
+        key = f"statistics:range:{start_date}:{end_date}:{current}"
+        timeout = OPEN_RANGE_CACHE_TIMEOUT
+    data = cache.get(key)
+    if data is None:
+        data = range_statistics(start_date, end_date)
+        cache.set(key, data, timeout)
+    return data
+
+
+def _bucket_starts(start_date, end_date, interval):
+    """First day of every bucket overlapping the range"""
+    if interval == "week":
+        start_date -= timedelta(days=start_date.weekday())
+    elif interval == "month":
+        start_date = start_date.replace(day=1)
+    bucket = start_date
+    while bucket <= end_date:
+        yield bucket
+        if interval == "day":
+            bucket += timedelta(days=1)
+        elif interval == "week":
+            bucket += timedelta(days=7)
+        else:
+            bucket = (bucket + timedelta(days=32)).replace(day=1)
+
+
+def statistics_series(start_date, end_date, interval="day"):
+    """
+    Counters of the date range per day, week or month, summed from the daily
+    rollups in one GROUP BY query. Rollup days are local dates, so buckets
+    follow the configured timezone. Empty buckets are included. Raises
+    RangeTooLong beyond MAX_SERIES_BUCKETS.
+    """
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    bucket_starts = list(
+        islice(_bucket_starts(start_date, end_date, interval), MAX_SERIES_BUCKETS + 1)
+    )
+    if len(bucket_starts) > MAX_SERIES_BUCKETS:
+        raise RangeTooLong(MAX_SERIES_BUCKETS)
+    rows = (
+        Statistics.objects.filter(
+            start_date__range=[start_date, end_date], finish_date=F("start_date")
+        )
+        .annotate(bucket=Trunc("start_date", interval, output_field=DateField()))
+        .values("bucket")
+        .annotate(**{field: Sum(field) for field in COUNTER_FIELDS})
+        .order_by("bucket")
+    )
+    buckets = {row.pop("bucket"): row for row in rows}
+
+    series = []
+    for bucket in bucket_starts:
+        totals = buckets.get(bucket) or dict.fromkeys(COUNTER_FIELDS, 0)
+        series.append({
+            "date": bucket,
+            **totals,
+            "conversion_rate": conversion_rate(totals),
+        })
+    return series
@@ -0,0 +1,76 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .renderers import CSVRenderer, NDJSONRenderer, dumps
+
+STREAM_CHUNK_SIZE = 500
+
+
+async def _async_chunks(chunks):
+    """
+    Produce the chunks one at a time on the sync thread that owns the
+    database connection (and its server-side cursor).
+    """
+    chunks = iter(chunks)
+    done = object()
+    while (chunk := await sync_to_async(next)(chunks, done)) is not done:
+        yield chunk
+
+
+def streaming_response(request, chunks, content_type):
+    """
+    A StreamingHttpResponse over the chunks. Under ASGI they are wrapped in
+    an async iterator, which Django streams instead of consuming the whole
+    iterator up front.
+    """
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        chunks = _async_chunks(chunks)
+    return StreamingHttpResponse(chunks, content_type=content_type)
+
+
+def stream_ndjson(queryset, get_serializer, chunk_size=STREAM_CHUNK_SIZE, request=None):
+    """
+    Stream a queryset as NDJSON. Rows are fetched through a server-side
+    cursor and serialized one chunk at a time, so memory stays bounded
+    whatever the size of the result.
+    """
+    renderer = NDJSONRenderer()
+
+    def lines():
+        rows = queryset.iterator(chunk_size=chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            yield renderer.render(get_serializer(chunk, many=True).data)
+
+    return streaming_response(request, lines(), renderer.media_type)
+
+
+def stream_export(request, queryset, columns, filename, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream the columns of a queryset as CSV, or as NDJSON when that is the
+    accepted format. Only the columns are selected and no model instances
+    or serializers are involved.
+    """
+    rows = queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+    if request.accepted_renderer.format == "ndjson":
+        renderer, extension = NDJSONRenderer(), "ndjson"
+
+        def chunks():
+            while chunk := list(islice(rows, chunk_size)):
+                yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in chunk)
+    else:
+        renderer, extension = CSVRenderer(), "csv"
+
+        def chunks():
+            yield renderer.render_rows([], header=columns)
+            while chunk := list(islice(rows, chunk_size)):
+                yield renderer.render_rows(chunk)
+
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f"{content_type}; charset={renderer.charset}"
+    response = streaming_response(request, chunks(), content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{extension}"'
+    return response
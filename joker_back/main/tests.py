@@ -1,3 +1,1903 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from importlib import import_module
+from functools import partial
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .counters import (
+    SEQUENCES,
+    counter_values,
+    UNREAD_CONTACTS,
+    real_counts,
+    reconcile_counters,
+    request_counter,
+    set_contacts_read,
+)
+from .events import CancelOnDisconnect, get_broker, issue_stream_ticket, redeem_stream_ticket
+from .idempotency import payload_hash
+from .management.commands.generate_fixtures import Faker
+from .models import (
+    Contact,
+    Counter,
+    PendingUpload,
+    Picture,
+    Request,
+    Statistics,
+    StoredImage,
+    Submission,
+    User,
+)
+from .pagination import keyset_queryset
+from .statistics import (
+    CLOSED_RANGE_CACHE_TIMEOUT,
+    OPEN_RANGE_CACHE_TIMEOUT,
+    RangeTooLong,
+    cached_range_statistics,
+    range_statistics,
+    refresh_daily_statistics,
+)
+from .transitions import bulk_update, transition
+from .uploads import process_pending_uploads
+from .utils import base64_to_image, uuid_to_date
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .search import REQUEST_SEARCH_FIELDS, search
+from .serializers import RequestSerializer
+from .streaming import stream_export
+from .views import ContactViewSet, RequestViewSet
+
+
+def make_request(**kwargs):
+    """Create a Request with sensible defaults for tests"""
+    defaults = {
+        "article": "t_shirt",
+        "phone": "0550000000",
+        "color": "white",
+        "size": "M",
+        "price": 1000,
+    }
+    defaults.update(kwargs)
+    return Request.objects.create(**defaults)
+
+
+def submission_key_for(header):
+    return hashlib.sha256(f"key:{header}".encode()).hexdigest()
+
+
+def png_bytes(color="red", size=(8, 8)):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def png_upload(name="design.png", color="red"):
+    return SimpleUploadedFile(name, png_bytes(color), content_type="image/png")
+
+
+class LocalMediaMixin:
+    """Store files in a throwaway MEDIA_ROOT through the filesystem storage"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(
+            MEDIA_ROOT=media_root,
+            DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage",
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+
+class StatisticsCalculateTests(TestCase):
+    def setUp(self):
+        # Cached results outlive the rolled back test data
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("stats-calculate")
+        self.today = timezone.now().date()
+
+    def test_counts_revenue_and_tops(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_request(state="unseen", color="black", repetitions=2)
+            make_request(state="seen", article="mug", color="black")
+            make_request(state="pending", article="mug", color="black")
+            make_request(state="progress", article="mug")
+            make_request(state="finished", price=500, is_delivered=True, repetitions=3)
+            make_request(state="finished", price=700)
+            # Outside the requested range
+            make_request(
+                state="finished", creation_date=timezone.now() - timedelta(days=30)
+            )
+
+        response = self.client.get(
+            self.url, {"start_date": self.today, "end_date": self.today}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["total_requests"], 6)
+        self.assertEqual(data["unseen_requests"], 1)
+        self.assertEqual(data["seen_requests"], 1)
+        self.assertEqual(data["pending_requests"], 1)
+        self.assertEqual(data["in_progress_requests"], 1)
+        self.assertEqual(data["finished_requests"], 2)
+        self.assertEqual(data["delivered_requests"], 1)
+        self.assertAlmostEqual(data["conversion_rate"], 50.0)
+        self.assertEqual(data["total_revenue"], 1200)
+        self.assertEqual(data["repetitions_count"], 5)
+        self.assertEqual(data["top_article"], "mug")
+        self.assertEqual(data["top_color"], "black")
+
+    def test_empty_range(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["total_requests"], 0)
+        self.assertEqual(data["total_revenue"], 0)
+        self.assertEqual(data["top_article"], "")
+        self.assertEqual(data["top_color"], "")
+
+    def test_query_budget(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for state in ["unseen", "seen", "pending", "progress", "finished"]:
+                make_request(state=state)
+
+        # The ETag sequences, then a single read of the daily rollup rows
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                self.url, {"start_date": self.today, "end_date": self.today}
+            )
+        self.assertEqual(response.status_code, 200)
+
+
+class DailyStatisticsRollupTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+
+    def test_created_request_updates_rollup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_request(state="unseen", article="mug")
+
+        rollup = Statistics.objects.get(start_date=self.today, finish_date=self.today)
+        self.assertEqual(rollup.total_requests, 1)
+        self.assertEqual(rollup.unseen_requests, 1)
+        self.assertEqual(rollup.top_article, "mug")
+        self.assertEqual(rollup.article_counts, {"mug": 1})
+
+    def test_state_and_delivery_changes_move_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = make_request(state="progress", price=800)
+
+        order.state = "finished"
+        order.is_delivered = True
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+
+        stats = range_statistics(self.today, self.today)
+        self.assertEqual(stats["in_progress_requests"], 0)
+        self.assertEqual(stats["finished_requests"], 1)
+        self.assertEqual(stats["delivered_requests"], 1)
+        self.assertEqual(stats["total_revenue"], 800)
+
+    def test_unrelated_save_does_not_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = make_request()
+
+        order.description = "new description"
+        with self.captureOnCommitCallbacks() as callbacks:
+            order.save()
+        self.assertEqual(callbacks, [])
+
+    def test_saves_share_one_refresh(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        with mock.patch("main.signals.refresh_daily_statistics") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                order = make_request(state="unseen")
+                order.state = "seen"
+                order.save()
+                make_request(creation_date=yesterday)
+        refresh.assert_called_once_with({self.today, self.today - timedelta(days=1)})
+
+    def test_rolled_back_savepoint_keeps_later_refresh(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    make_request()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            make_request(article="mug")
+        self.assertEqual(Statistics.objects.get().article_counts, {"mug": 1})
+
+    def test_delete_removes_empty_rollup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = make_request()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+
+        self.assertFalse(Statistics.objects.exists())
+
+    def test_range_merges_days(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_request(article="mug", creation_date=yesterday)
+            make_request(article="mug", creation_date=yesterday)
+            make_request(article="t_shirt")
+
+        stats = range_statistics(self.today - timedelta(days=1), self.today)
+        self.assertEqual(stats["total_requests"], 3)
+        self.assertEqual(stats["top_article"], "mug")
+        self.assertEqual(Statistics.objects.count(), 2)
+
+    def test_rebuild_command_matches_raw_rows(self):
+        last_week = timezone.now() - timedelta(days=7)
+        # Rows written without signals, as an old database would have them
+        Request.objects.bulk_create(
+            [
+                Request(article="mug", state="finished", price=300),
+                Request(article="t_shirt", state="unseen", creation_date=last_week),
+                Request(article="t_shirt", state="seen", creation_date=last_week),
+            ]
+        )
+        self.assertFalse(Statistics.objects.exists())
+
+        call_command("rebuild_statistics", stdout=StringIO())
+
+        stats = range_statistics(self.today - timedelta(days=7), self.today)
+        self.assertEqual(stats["total_requests"], 3)
+        self.assertEqual(stats["finished_requests"], 1)
+        self.assertEqual(stats["total_revenue"], 300)
+        self.assertEqual(stats["top_article"], "t_shirt")
+        self.assertEqual(Statistics.objects.count(), 2)
+
+    def test_refresh_locks_the_day_before_aggregating(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_request()
+        with CaptureQueriesContext(connection) as queries:
+            refresh_daily_statistics({self.today})
+        sql = [query["sql"] for query in queries.captured_queries]
+        lock = next(i for i, query in enumerate(sql) if query.startswith('SELECT "main_statistics"'))
+        aggregate = next(i for i, query in enumerate(sql) if 'FROM "main_request"' in query)
+        self.assertLess(lock, aggregate)
+        self.assertEqual(Statistics.objects.get().total_requests, 1)
+
+    def test_failed_refresh_keeps_the_order(self):
+        client = APIClient()
+        with mock.patch("main.signals.refresh_daily_statistics", side_effect=RuntimeError):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post(
+                    "/api/requests/", {"article": "mug", "phone": "0550000000", "color": "black"}
+                )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Request.objects.exists())
+
+    def test_migration_backfills_history(self):
+        Request.objects.bulk_create([
+            Request(article="mug", creation_date=timezone.now() - timedelta(days=30)),
+            Request(article="mug"),
+        ])
+        migration = import_module("main.migrations.0014_statistics_daily_rollup")
+        migration.backfill_daily_rollups(apps, None)
+        self.assertEqual(Statistics.objects.count(), 2)
+        stats = range_statistics(self.today - timedelta(days=30), self.today)
+        self.assertEqual(stats["total_requests"], 2)
+
+
+class QueryPlanTests(TestCase):
+    """The hot dashboard queries must be able to use an index"""
+
+    def setUp(self):
+        for state in ["unseen", "seen", "pending", "progress", "finished"]:
+            make_request(state=state)
+        Contact.objects.create(
+            fullName="Test", email="test@example.com", phoneNumber="0", message="Hi"
+        )
+
+    def assertUsesIndex(self, queryset, *index_names):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Tiny test tables would otherwise always be sequentially scanned
+                cursor.execute("SET enable_seqscan = off")
+            try:
+                plan = queryset.explain()
+            finally:
+                if connection.vendor == "postgresql":
+                    cursor.execute("RESET enable_seqscan")
+        self.assertTrue(
+            any(name in plan for name in index_names),
+            f"None of {index_names} used by plan:\n{plan}",
+        )
+
+    def test_request_list(self):
+        queryset = RequestViewSet.queryset.all()[:20]
+        self.assertUsesIndex(queryset, "request_created_idx")
+
+    def test_request_state_actions(self):
+        for state in ["pending", "progress", "finished"]:
+            queryset = Request.objects.filter(state=state).order_by("-creation_date")
+            self.assertUsesIndex(queryset, "request_state_idx")
+
+    def test_request_unseen(self):
+        queryset = Request.objects.filter(state="unseen").order_by("-creation_date")
+        self.assertUsesIndex(queryset, "request_unseen_idx", "request_state_idx")
+
+    @skipUnless(
+        connection.vendor == "postgresql",
+        "SQLite only matches expression indexes against literal SQL",
+    )
+    def test_request_date_range(self):
+        today = timezone.localdate()
+        queryset = Request.objects.filter(creation_date__date__range=[today, today])
+        self.assertUsesIndex(queryset, "request_created_day_idx")
+
+    def test_request_list_cursor(self):
+        order = Request.objects.order_by("-creation_date", "-id").first()
+        for backwards in (False, True):
+            queryset = keyset_queryset(
+                RequestViewSet.queryset.all(),
+                "creation_date",
+                (order.creation_date, order.pk),
+                backwards,
+            )[:20]
+            self.assertUsesIndex(queryset, "request_created_idx")
+
+    def test_contact_list(self):
+        queryset = ContactViewSet.queryset.all()[:20]
+        self.assertUsesIndex(queryset, "contact_timestamp_idx")
+
+    def test_contact_unread(self):
+        queryset = Contact.objects.filter(read=False).order_by("-timestamp")
+        self.assertUsesIndex(queryset, "contact_unread_idx")
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+        now = timezone.now()
+        # Pairs of rows share a creation date so the id tie-breaker matters
+        self.orders = [
+            make_request(creation_date=now - timedelta(hours=index // 2))
+            for index in range(7)
+        ]
+        self.expected_ids = [
+            order.id
+            for order in sorted(
+                self.orders, key=lambda order: (order.creation_date, order.id), reverse=True
+            )
+        ]
+
+    def get(self, **params):
+        response = self.client.get("/api/requests/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_page_contract_is_kept(self):
+        data = self.get(page=2, page_size=3)
+        self.assertEqual(data["count"], 7)
+        self.assertEqual(data["page"], 2)
+        self.assertEqual(data["total_pages"], 3)
+        self.assertEqual(len(data["results"]), 3)
+
+    def test_cursor_walks_forward_and_back(self):
+        pages = []
+        data = self.get(cursor="", page_size=3)
+        self.assertIsNone(data["previous"])
+        self.assertNotIn("count", data)
+        pages.append(data)
+        while data["next"]:
+            data = self.get(cursor=data["next"], page_size=3)
+            pages.append(data)
+
+        seen = [row["id"] for page in pages for row in page["results"]]
+        self.assertEqual(seen, self.expected_ids)
+        self.assertEqual(len(pages), 3)
+
+        back = self.get(cursor=pages[2]["previous"], page_size=3)
+        self.assertEqual(back["results"], pages[1]["results"])
+        first = self.get(cursor=back["previous"], page_size=3)
+        self.assertEqual(first["results"], pages[0]["results"])
+        self.assertIsNone(first["previous"])
+
+    def test_cursor_page_queries(self):
+        for index in range(3):
+            Contact.objects.create(
+                fullName=f"Test {index}", email="t@example.com", phoneNumber="0", message="Hi"
+            )
+        # The ETag sequence and the page itself, no COUNT(*)
+        with self.assertNumQueries(2):
+            self.client.get("/api/contacts/", {"cursor": "", "page_size": 2})
+
+    def test_optional_counts(self):
+        self.assertEqual(self.get(cursor="", count="exact")["count"], 7)
+        self.assertGreaterEqual(self.get(cursor="", count="estimate")["count"], 0)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/requests/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_contact_cursor(self):
+        for index in range(3):
+            Contact.objects.create(
+                fullName=f"Test {index}", email="t@example.com", phoneNumber="0", message="Hi"
+            )
+        response = self.client.get("/api/contacts/", {"cursor": "", "page_size": 2})
+        data = response.json()
+        self.assertEqual(len(data["results"]), 2)
+        response = self.client.get("/api/contacts/", {"cursor": data["next"]})
+        self.assertEqual(len(response.json()["results"]), 1)
+
+
+class StateActionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+        for index in range(5):
+            make_request(state="unseen", creation_date=timezone.now() - timedelta(hours=index))
+        make_request(state="finished")
+
+    def test_actions_are_paginated(self):
+        response = self.client.get("/api/requests/unseen/", {"page_size": 2})
+        data = response.json()
+        self.assertEqual(data["count"], 5)
+        self.assertEqual(data["total_pages"], 3)
+        self.assertEqual([row["state"] for row in data["results"]], ["unseen"] * 2)
+
+        response = self.client.get("/api/requests/finished/", {"cursor": ""})
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_ndjson_stream(self):
+        response = self.client.get("/api/requests/unseen/", {"format": "ndjson"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 5)
+        dates = [row["creation_date"] for row in rows]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+    def test_unread_contacts(self):
+        for read in [False, False, True]:
+            Contact.objects.create(
+                fullName="Test", email="t@example.com", phoneNumber="0", message="Hi", read=read
+            )
+        data = self.client.get("/api/contacts/unread/").json()
+        self.assertEqual(data["count"], 2)
+
+        response = self.client.get(
+            "/api/contacts/unread/", HTTP_ACCEPT="application/x-ndjson"
+        )
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 2)
+
+
+@override_settings(DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage")
+class RequestImageUrlTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+
+    def test_list_query_count_is_fixed(self):
+        for index in range(100):
+            order = make_request()
+            Picture.objects.create(request=order, image=f"order_pictures/{index}.png")
+            Picture.objects.create(request=order, image=f"order_pictures/{index}-b.png")
+
+        # The ETag sequence, COUNT(*) and the page itself, whatever the page size
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/requests/", {"page_size": 100})
+        results = response.json()["results"]
+        self.assertEqual(len(results), 100)
+        for row in results:
+            self.assertRegex(row["back_image_url"], r"^/media/order_pictures/\d+\.png$")
+
+    def test_back_image_takes_precedence(self):
+        order = make_request(back_image="order_designs/back/own.png")
+        Picture.objects.create(request=order, image="order_pictures/other.png")
+        bare = make_request()
+
+        data = self.client.get(f"/api/requests/{order.id}/").json()
+        self.assertEqual(data["back_image_url"], "/media/order_designs/back/own.png")
+        data = self.client.get(f"/api/requests/{bare.id}/").json()
+        self.assertIsNone(data["back_image_url"])
+
+
+class DeferredUploadTests(LocalMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def post_order(self):
+        return self.client.post(
+            "/api/requests/",
+            {
+                "article": "t_shirt",
+                "phone": "0550000000",
+                "front_image": png_upload("front.png"),
+                "back_image": png_upload("back.png", color="blue"),
+            },
+            format="multipart",
+        )
+
+    def test_synchronous_upload(self):
+        response = self.post_order()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["upload_status"], "complete")
+        order = Request.objects.get()
+        self.assertTrue(default_storage.exists(order.front_image.name))
+        self.assertTrue(default_storage.exists(order.back_image.name))
+        self.assertEqual(order.pictures.count(), 1)
+
+    @override_settings(DEFERRED_IMAGE_UPLOADS=True)
+    def test_deferred_upload(self):
+        response = self.post_order()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["upload_status"], "pending")
+        order = Request.objects.get()
+        self.assertFalse(order.front_image)
+        self.assertEqual(PendingUpload.objects.count(), 2)
+        staged = [upload.file.path for upload in PendingUpload.objects.all()]
+
+        self.assertEqual(process_pending_uploads(), (2, 0))
+
+        order.refresh_from_db()
+        self.assertEqual(order.upload_status, "complete")
+        self.assertTrue(default_storage.exists(order.front_image.name))
+        self.assertTrue(default_storage.exists(order.back_image.name))
+        self.assertEqual(order.pictures.count(), 1)
+        self.assertFalse(PendingUpload.objects.exists())
+        for path in staged:
+            self.assertFalse(os.path.exists(path))
+
+    @override_settings(DEFERRED_IMAGE_UPLOADS=True)
+    def test_failed_upload_is_retried_then_marked(self):
+        self.post_order()
+
+        with mock.patch("main.uploads.attach_image", side_effect=OSError("offline")):
+            self.assertEqual(process_pending_uploads(), (0, 2))
+            for _ in range(4):
+                process_pending_uploads()
+
+        upload = PendingUpload.objects.first()
+        self.assertEqual(upload.attempts, 5)
+        self.assertEqual(upload.last_error, "offline")
+        self.assertEqual(Request.objects.get().upload_status, "failed")
+        # Exhausted uploads are left for inspection
+        self.assertEqual(process_pending_uploads(), (0, 0))
+
+
+class ContentAddressedStorageTests(LocalMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def post_order(self, color):
+        response = self.client.post(
+            "/api/requests/",
+            {
+                "article": "t_shirt",
+                "phone": "0550000000",
+                "back_image": png_upload("back.png", color=color),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        return Request.objects.get(pk=response.json()["id"])
+
+    def test_identical_designs_are_stored_once(self):
+        first = self.post_order("red")
+        second = self.post_order("red")
+
+        stored = StoredImage.objects.get()
+        self.assertEqual(first.back_image.name, stored.file.name)
+        self.assertEqual(second.back_image.name, stored.file.name)
+        self.assertEqual(
+            set(Picture.objects.values_list("image", flat=True)), {stored.file.name}
+        )
+        # Two requests and their two compatibility pictures
+        self.assertEqual(stored.ref_count, 4)
+        directory = os.path.dirname(stored.file.path)
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_stored_name_keeps_detected_format(self):
+        buffer = BytesIO()
+        Image.new("RGB", (8, 8), "red").save(buffer, format="JPEG")
+        data_uri = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+        response = self.client.post(
+            "/api/requests/",
+            {"article": "mug", "phone": "0550000000", "frontImage": data_uri},
+            format="json",
+        )
+        order = Request.objects.get(pk=response.json()["id"])
+        digest = StoredImage.objects.get().sha256
+        self.assertEqual(order.front_image.name, f"designs/{digest[:2]}/{digest}.jpg")
+
+    def test_different_designs_are_stored_separately(self):
+        self.post_order("red")
+        self.post_order("blue")
+        self.assertEqual(StoredImage.objects.count(), 2)
+
+    def test_cleanup_after_last_reference(self):
+        first = self.post_order("red")
+        second = self.post_order("red")
+        stored = StoredImage.objects.get()
+
+        first.delete()
+        stored.refresh_from_db()
+        self.assertEqual(stored.ref_count, 2)
+        call_command("cleanup_images", stdout=StringIO())
+        self.assertTrue(default_storage.exists(stored.file.name))
+
+        second.delete()
+        stored.refresh_from_db()
+        self.assertEqual(stored.ref_count, 0)
+        call_command("cleanup_images", stdout=StringIO())
+        self.assertFalse(StoredImage.objects.exists())
+        self.assertFalse(default_storage.exists(stored.file.name))
+
+    def test_cleanup_repairs_wrong_counter(self):
+        order = self.post_order("red")
+        StoredImage.objects.update(ref_count=0)
+
+        call_command("cleanup_images", stdout=StringIO())
+
+        stored = StoredImage.objects.get()
+        self.assertEqual(stored.ref_count, 2)
+        self.assertTrue(default_storage.exists(order.back_image.name))
+
+
+class Base64ImageTests(TestCase):
+    def test_data_uri_png(self):
+        payload = png_bytes()
+        data_uri = "data:image/png;base64," + base64.b64encode(payload).decode()
+
+        image = base64_to_image(data_uri, "front_1")
+
+        self.assertTrue(image.name.startswith("front_1_"))
+        self.assertTrue(image.name.endswith(".png"))
+        self.assertEqual(image.read(), payload)
+
+    def test_detects_real_format(self):
+        buffer = BytesIO()
+        Image.new("RGB", (8, 8), "red").save(buffer, format="JPEG")
+        # The declared type is wrong, the bytes win
+        data_uri = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+        image = base64_to_image(data_uri, "back_1")
+
+        self.assertTrue(image.name.endswith(".jpg"))
+
+    def test_raw_base64_with_line_breaks_and_no_padding(self):
+        payload = bytes(range(256)) * 1000 + b"x"
+        encoded = base64.encodebytes(payload).decode().rstrip("=\n")
+
+        image = base64_to_image(encoded, "front_1")
+
+        self.assertEqual(image.read(), payload)
+        self.assertTrue(image.name.endswith(".png"))
+
+    def test_invalid_payload(self):
+        self.assertIsNone(base64_to_image("data:image/png;base64,***", "front_1"))
+        self.assertIsNone(base64_to_image("", "front_1"))
+
+    def test_peak_memory_is_bounded(self):
+        """Memory benchmark: decoding a 7.5 MB image must not copy the payload"""
+        payload = os.urandom(7_500_000)
+        data_uri = "data:image/png;base64," + base64.b64encode(payload).decode()
+
+        tracemalloc.start()
+        try:
+            image = base64_to_image(data_uri, "front_1")
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(image.size, len(payload))
+        # Splitting and decoding the whole string peaks above 25 MB here
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+        self.order = make_request(frontImage="A" * 1000, backImage="B" * 1000)
+
+    def get_with_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        sql = " ".join(query["sql"] for query in queries.captured_queries)
+        return response.json(), sql
+
+    def test_default_list_leaves_out_blobs(self):
+        data, sql = self.get_with_queries("/api/requests/")
+        row = data["results"][0]
+        self.assertNotIn("frontImage", row)
+        self.assertNotIn("backImage", row)
+        self.assertIn("back_image_url", row)
+        self.assertNotIn('"frontImage"', sql)
+        self.assertNotIn('"backImage"', sql)
+
+    def test_selected_fields_drive_the_query(self):
+        data, sql = self.get_with_queries(
+            "/api/requests/", {"fields": "id,state,front_image_url"}
+        )
+        self.assertEqual(set(data["results"][0]), {"id", "state", "front_image_url"})
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"referrer"', sql)
+        self.assertNotIn("main_picture", sql)
+        self.assertIn('"design"', sql)
+
+    def test_exclude(self):
+        data, sql = self.get_with_queries("/api/requests/", {"exclude": "referrer,text"})
+        row = data["results"][0]
+        self.assertNotIn("referrer", row)
+        self.assertIn("frontImage", row)
+        self.assertNotIn('"referrer"', sql)
+
+        data, _ = self.get_with_queries("/api/requests/", {"exclude": ""})
+        self.assertEqual(data["results"][0]["backImage"], "B" * 1000)
+
+    def test_state_actions_and_detail(self):
+        data, _ = self.get_with_queries("/api/requests/unseen/", {"fields": "id"})
+        self.assertEqual(data["results"], [{"id": self.order.id}])
+
+        data, _ = self.get_with_queries(f"/api/requests/{self.order.id}/")
+        self.assertEqual(data["frontImage"], "A" * 1000)
+
+    def test_unknown_field(self):
+        response = self.client.get("/api/requests/", {"fields": "id,nope"})
+        self.assertEqual(response.status_code, 400)
+
+
+class LegacyImageMigrationTests(LocalMediaMixin, TestCase):
+    def test_blobs_move_to_storage(self):
+        encoded = base64.b64encode(png_bytes()).decode()
+        both = make_request(frontImage="data:image/png;base64," + encoded, backImage=encoded)
+        url_only = make_request(frontImage="https://example.com/design.png")
+        broken = make_request(frontImage="data:image/png;base64,***")
+        untouched = make_request(description="no images")
+
+        output = StringIO()
+        call_command("migrate_legacy_images", "--batch-size", "2", "--workers", "1", stdout=output)
+
+        both.refresh_from_db()
+        self.assertIsNone(both.frontImage)
+        self.assertIsNone(both.backImage)
+        self.assertTrue(default_storage.exists(both.front_image.name))
+        # Same bytes on both sides, stored once
+        self.assertEqual(both.front_image.name, both.back_image.name)
+        self.assertEqual(StoredImage.objects.get().ref_count, 2)
+
+        url_only.refresh_from_db()
+        self.assertEqual(url_only.frontImage, "https://example.com/design.png")
+        broken.refresh_from_db()
+        self.assertEqual(broken.frontImage, "data:image/png;base64,***")
+        untouched.refresh_from_db()
+        self.assertEqual(untouched.description, "no images")
+
+        self.assertIn("rows/s", output.getvalue())
+        self.assertIn("Successfully migrated 1 rows", output.getvalue())
+        self.assertIn("1 failures", output.getvalue())
+
+    def test_resume_from_id(self):
+        encoded = base64.b64encode(png_bytes()).decode()
+        first = make_request(frontImage=encoded)
+        second = make_request(frontImage=encoded)
+
+        call_command(
+            "migrate_legacy_images", "--workers", "1", "--start-id", str(second.id),
+            stdout=StringIO(),
+        )
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.frontImage, encoded)
+        self.assertIsNone(second.frontImage)
+
+
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_progress = [make_request(state="progress") for _ in range(5)]
+            self.other = make_request(state="pending")
+
+    def post(self, action, data):
+        return self.client.post(f"/api/requests/{action}/", data, format="json")
+
+    def test_update_status_by_ids_is_one_update(self):
+        ids = [order.id for order in self.in_progress[:3]]
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.post("bulk_update_status", {"ids": ids, "status": "finished"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json()["updated"]), sorted(ids))
+        updates = [
+            query for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "main_request"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Request.objects.filter(state="finished").count(), 3)
+        # The rollup followed the bulk change
+        today = timezone.localdate()
+        stats = range_statistics(today, today)
+        self.assertEqual(stats["finished_requests"], 3)
+        self.assertEqual(stats["in_progress_requests"], 2)
+
+    def test_update_status_by_filter(self):
+        response = self.post(
+            "bulk_update_status", {"filter": {"state": "progress"}, "status": "finished"}
+        )
+        self.assertEqual(response.json()["count"], 5)
+        self.assertEqual(Request.objects.get(pk=self.other.pk).state, "pending")
+
+    def test_mark_seen_and_delivered(self):
+        response = self.post("bulk_mark_seen", {"ids": [self.other.id]})
+        self.assertEqual(response.json()["updated"], [self.other.id])
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.state, self.other.is_seen), ("seen", True))
+
+        response = self.post("bulk_mark_delivered", {"filter": {"is_delivered": False}})
+        self.assertEqual(response.json()["count"], 6)
+        self.assertFalse(Request.objects.filter(is_delivered=False).exists())
+
+    def test_validation(self):
+        self.assertEqual(
+            self.post("bulk_update_status", {"ids": [1], "status": "lost"}).status_code, 400
+        )
+        self.assertEqual(self.post("bulk_mark_seen", {}).status_code, 400)
+        self.assertEqual(self.post("bulk_mark_seen", {"ids": "1,2"}).status_code, 400)
+        self.assertEqual(
+            self.post("bulk_mark_seen", {"filter": {"phone": "0550000000"}}).status_code, 400
+        )
+        self.assertEqual(
+            self.post("bulk_mark_seen", {"filter": {"state": "lost"}}).status_code, 400
+        )
+
+    def test_unknown_ids_are_not_reported(self):
+        response = self.post("bulk_mark_seen", {"ids": [self.other.id, 999999]})
+        self.assertEqual(response.json()["updated"], [self.other.id])
+
+    def test_limit(self):
+        with mock.patch("main.transitions.BULK_UPDATE_LIMIT", 2):
+            response = self.post("bulk_mark_delivered", {"filter": {"state": "progress"}})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Request.objects.filter(is_delivered=True).exists())
+
+
+class CompareAndSetTransitionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+        self.order = make_request(state="progress", description="original")
+
+    def post(self, action, data=None, pk=None):
+        pk = pk or self.order.pk
+        return self.client.post(f"/api/requests/{pk}/{action}/", data or {}, format="json")
+
+    def test_single_conditional_update(self):
+        reconcile_counters()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(
+                "update_status", {"status": "finished", "expected_status": ["progress"]}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["state"], "finished")
+        # The state counters are adjusted in the same transaction
+        statements = [
+            query["sql"] for query in queries.captured_queries
+            if '"main_request"' in query["sql"]
+        ]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('UPDATE "main_request" SET "state"'))
+        self.assertIn('"state" = \'progress\'', statements[0])
+        self.assertNotIn('"description"', statements[0])
+
+    @skipUnless(connection.vendor == "postgresql", "SQLite cannot return the replaced state")
+    def test_single_statement_without_single_expected_state(self):
+        reconcile_counters()
+        steps = [{"status": "pending"}, {"status": "finished", "expected_status": ["pending", "seen"]}]
+        for data in steps:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post("update_status", data)
+            self.assertEqual(response.status_code, 200)
+            statements = [
+                query["sql"] for query in queries.captured_queries
+                if '"main_request"' in query["sql"]
+            ]
+            self.assertEqual(len(statements), 1)
+            self.assertIn("RETURNING", statements[0])
+        self.assertEqual(
+            counter_values(request_counter("progress"), request_counter("finished")), [0, 1]
+        )
+        self.assertEqual(reconcile_counters(), {})
+
+    def test_conflict(self):
+        response = self.post("update_status", {"status": "finished", "expected_status": "pending"})
+
+        self.assertEqual(response.status_code, 409)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.state, "progress")
+
+    def test_unconditional_update_keeps_other_columns(self):
+        # Another admin edits the row after our copy was loaded
+        Request.objects.filter(pk=self.order.pk).update(description="edited")
+
+        response = self.post("update_status", {"status": "pending"})
+
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.state, self.order.description), ("pending", "edited"))
+
+    def test_mark_seen(self):
+        response = self.post("mark_seen", {"expected_status": "unseen"})
+        self.assertEqual(response.status_code, 409)
+
+        response = self.post("mark_seen")
+        self.assertEqual(response.json(), {
+            "status": "request marked as seen", "state": "seen", "is_seen": True
+        })
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.is_seen)
+
+    def test_missing_request_and_bad_input(self):
+        self.assertEqual(self.post("update_status", {"status": "seen"}, pk=999999).status_code, 404)
+        self.assertEqual(self.post("update_status", {"status": "lost"}).status_code, 400)
+        self.assertEqual(
+            self.post("update_status", {"status": "seen", "expected_status": "lost"}).status_code,
+            400,
+        )
+
+    def test_rollup_follows_transition(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post("update_status", {"status": "finished"})
+        today = timezone.localdate()
+        self.assertEqual(range_statistics(today, today)["finished_requests"], 1)
+
+
+class EventPublishingTests(TestCase):
+    def setUp(self):
+        self.broker = mock.Mock()
+        patcher = mock.patch("main.events.get_broker", return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published(self):
+        return [call.args for call in self.broker.publish.call_args_list]
+
+    def test_nothing_published_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            make_request()
+        self.assertEqual(self.published(), [])
+
+    def test_request_created_and_state_changed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = make_request()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.description = "no state change"
+            order.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.state = "pending"
+            order.save()
+
+        (created_type, created), (changed_type, changed) = self.published()
+        self.assertEqual(created_type, "request.created")
+        self.assertEqual((created["id"], created["state"]), (order.pk, "unseen"))
+        self.assertEqual(changed_type, "request.state_changed")
+        self.assertEqual(changed, {"id": order.pk, "state": "pending", "previous_state": "unseen"})
+
+    def test_queryset_transitions(self):
+        first, second = make_request(), make_request(state="pending")
+        self.broker.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_update(Request.objects.filter(pk__in=[first.pk, second.pk]), state="finished")
+        with self.captureOnCommitCallbacks(execute=True):
+            transition(first.pk, "delivered")
+
+        self.assertCountEqual(self.published(), [
+            ("request.state_changed", {"id": first.pk, "state": "finished", "previous_state": "unseen"}),
+            ("request.state_changed", {"id": second.pk, "state": "finished", "previous_state": "pending"}),
+            ("request.state_changed", {"id": first.pk, "state": "delivered", "previous_state": "finished"}),
+        ])
+
+    def test_contact_created(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            contact = Contact.objects.create(
+                fullName="Client", email="client@example.com", phoneNumber="0550000000", message="Hi"
+            )
+        [(event_type, data)] = self.published()
+        self.assertEqual((event_type, data["id"]), ("contact.created", contact.pk))
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("admin@example.com")
+        self.token = Token.objects.create(user=self.user)
+        self.ticket = issue_stream_ticket(self.user)
+
+    async def test_streams_published_events(self):
+        response = await AsyncClient().get("/api/events/", {"ticket": self.ticket})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        try:
+            self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+            # The generator subscribes once it starts running
+            get_broker().publish("request.created", {"id": 7})
+            event = await anext(stream)
+        finally:
+            await stream.aclose()
+        self.assertTrue(event.endswith(b'event: request.created\ndata: {"id": 7}\n\n'))
+
+    async def test_requires_authentication(self):
+        response = await AsyncClient().get("/api/events/", {"ticket": "wrong"})
+        self.assertEqual(response.status_code, 401)
+        # API tokens are not accepted in the URL, where logs would keep them
+        response = await AsyncClient().get("/api/events/", {"token": self.token.key})
+        self.assertEqual(response.status_code, 401)
+
+    def test_tickets(self):
+        client = APIClient()
+        self.assertEqual(client.post("/api/events/ticket/").status_code, 401)
+        client.force_authenticate(self.user)
+        ticket = client.post("/api/events/ticket/").json()["ticket"]
+        self.assertEqual(redeem_stream_ticket(ticket), self.user.pk)
+        # Single use
+        self.assertIsNone(redeem_stream_ticket(ticket))
+        ticket = issue_stream_ticket(self.user)
+        with mock.patch("django.core.signing.time.time", return_value=time.time() + 60):
+            self.assertIsNone(redeem_stream_ticket(ticket))
+
+    def test_refused_under_wsgi(self):
+        response = self.client.get("/api/events/", {"ticket": self.ticket})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("ASGI", response.json()["error"])
+
+
+class EventStreamDisconnectTests(TransactionTestCase):
+    """Served by the real ASGI handler, on its own thread and connection"""
+
+    async def test_disconnect_ends_the_stream(self):
+        broker = get_broker()
+        ticket = issue_stream_ticket(await User.objects.acreate(email="admin@example.com"))
+        application = CancelOnDisconnect(ASGIHandler(), paths=["/api/events/"])
+        messages = asyncio.Queue()
+        await messages.put({"type": "http.request"})
+        sent = []
+        started = asyncio.Event()
+
+        async def send(message):
+            sent.append(message)
+            if message.get("body") == b"retry: 5000\n\n":
+                started.set()
+
+        scope = {
+            "type": "http", "method": "GET", "path": "/api/events/",
+            "query_string": f"ticket={ticket}".encode(),
+            "headers": [(b"host", b"testserver")],
+        }
+        app = asyncio.create_task(application(scope, messages.get, send))
+        await asyncio.wait_for(started.wait(), 5)
+        self.assertEqual(len(broker._subscribers), 1)
+
+        await messages.put({"type": "http.disconnect"})
+        await asyncio.wait_for(app, 5)
+        self.assertEqual(len(broker._subscribers), 0)
+        self.assertEqual(sent[0]["status"], 200)
+
+
+class CounterStoreTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+
+    def make_contact(self, **kwargs):
+        return Contact.objects.create(
+            fullName="Client", email="client@example.com", phoneNumber="0550000000",
+            message="Hi", **kwargs
+        )
+
+    def assertCountersMatch(self):
+        real = real_counts()
+        for name, value in Counter.objects.values_list("name", "value"):
+            if name not in SEQUENCES:
+                self.assertEqual(value, real[name], name)
+
+    def test_request_counters_follow_every_write_path(self):
+        first, second, third = make_request(), make_request(), make_request(state="pending")
+        first.state = "seen"
+        first.save()
+        bulk_update(Request.objects.filter(pk__in=[first.pk, second.pk]), state="progress")
+        transition(third.pk, "finished")
+        transition(second.pk, "seen", ["progress"])
+        third.delete()
+
+        self.assertCountersMatch()
+        self.assertEqual(self.client.get("/api/requests/counts/").json(), {
+            "unseen": 0, "seen": 1, "pending": 0, "progress": 1, "finished": 0,
+        })
+
+    def test_unread_contact_counter(self):
+        contacts = [self.make_contact() for _ in range(3)]
+        self.make_contact(read=True)
+        contacts[0].read = True
+        contacts[0].save()
+        contacts[1].delete()
+        self.assertEqual(set_contacts_read(Contact.objects.all(), False), 2)
+        self.assertEqual(set_contacts_read(Contact.objects.all(), True), 3)
+        self.make_contact()
+
+        self.assertCountersMatch()
+        self.assertEqual(self.client.get("/api/contacts/unread_count/").json(), {"unread_count": 1})
+
+    def test_badges_do_not_touch_the_tables(self):
+        make_request()
+        self.make_contact()
+        reconcile_counters()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/requests/counts/")
+            self.client.get("/api/contacts/unread_count/")
+        # Each response reads its counter and its ETag sequence
+        self.assertEqual(len(queries), 4)
+        for query in queries.captured_queries:
+            self.assertIn('"main_counter"', query["sql"])
+
+    def test_reconcile_repairs_drift(self):
+        make_request()
+        Counter.objects.filter(name=request_counter("unseen")).update(value=42)
+        Counter.objects.filter(name=UNREAD_CONTACTS).delete()
+
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+
+        self.assertIn("requests:unseen: 42 -> 1", out.getvalue())
+        self.assertIn("contacts:unread: None -> 0", out.getvalue())
+        self.assertCountersMatch()
+
+
+class StatisticsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.last_week = self.today - timedelta(days=7)
+        self.yesterday = self.today - timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old = make_request(creation_date=timezone.now() - timedelta(days=3))
+
+    def test_range_cached_until_a_request_of_the_range_changes(self):
+        self.assertEqual(cached_range_statistics(self.last_week, self.yesterday)["total_requests"], 1)
+        # Only the sequences are read
+        with self.assertNumQueries(1):
+            cached_range_statistics(self.last_week, self.yesterday)
+
+        # Changes outside the range keep the entry
+        with self.captureOnCommitCallbacks(execute=True):
+            make_request()
+        with mock.patch("main.statistics.range_statistics") as compute:
+            cached_range_statistics(self.last_week, self.yesterday)
+        compute.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old.state = "finished"
+            self.old.save()
+        stats = cached_range_statistics(self.last_week, self.yesterday)
+        self.assertEqual(stats["finished_requests"], 1)
+
+    def test_ranges_including_today(self):
+        self.assertEqual(cached_range_statistics(self.last_week, self.today)["total_requests"], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_request()
+        self.assertEqual(cached_range_statistics(self.last_week, self.today)["total_requests"], 2)
+
+    def test_open_ranges_expire_sooner(self):
+        with mock.patch("main.statistics.cache") as mocked:
+            mocked.get.return_value = None
+            cached_range_statistics(self.last_week, self.yesterday)
+            cached_range_statistics(self.last_week, self.today)
+        timeouts = [call.args[2] for call in mocked.set.call_args_list]
+        self.assertEqual(timeouts, [CLOSED_RANGE_CACHE_TIMEOUT, OPEN_RANGE_CACHE_TIMEOUT])
+
+    def test_invalidation_reaches_other_processes(self):
+        cached_range_statistics(self.last_week, self.yesterday)
+        # Another process refreshes the day: nothing is left in our cache
+        with mock.patch("main.statistics.cache"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.old.delete()
+        self.assertEqual(cached_range_statistics(self.last_week, self.yesterday)["total_requests"], 0)
+
+    def test_long_ranges(self):
+        start = self.yesterday - timedelta(days=3600)
+        cached_range_statistics(start, self.yesterday)
+        with mock.patch("main.statistics.range_statistics") as compute:
+            cached_range_statistics(start, self.yesterday)
+        compute.assert_not_called()
+        start = date(2005, 1, 1)
+        with self.assertRaises(RangeTooLong):
+            cached_range_statistics(start, self.yesterday)
+        response = APIClient().get(
+            reverse("stats-calculate"), {"start_date": str(start), "end_date": str(self.yesterday)}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_rebuild_invalidates_everything(self):
+        cached_range_statistics(self.last_week, self.yesterday)
+        Request.objects.filter(pk=self.old.pk).update(price=300, state="finished")
+        call_command("rebuild_statistics", stdout=StringIO())
+        stats = cached_range_statistics(self.last_week, self.yesterday)
+        self.assertEqual(stats["total_revenue"], 300)
+
+    def test_endpoint_accepts_date_strings(self):
+        client = APIClient()
+        url = reverse("stats-calculate")
+        params = {"start_date": str(self.last_week), "end_date": str(self.yesterday)}
+        self.assertEqual(client.get(url, params).json()["total_requests"], 1)
+        # The hit reuses the sequences read for the ETag
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get(url, params).json()["total_requests"], 1)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+        self.order = make_request()
+
+    def revalidate(self, url, params=None):
+        first = self.client.get(url, params)
+        self.assertEqual(first.status_code, 200)
+        return first["ETag"], self.client.get(url, params, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    def test_not_modified_skips_queries_and_serialization(self):
+        etag, _ = self.revalidate("/api/requests/")
+        with mock.patch.object(RequestSerializer, "to_representation") as serialize:
+            with self.assertNumQueries(1):
+                response = self.client.get("/api/requests/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        serialize.assert_not_called()
+
+    def test_validators_change_with_the_data(self):
+        etag, response = self.revalidate(f"/api/requests/{self.order.pk}/")
+        self.assertEqual(response.status_code, 304)
+
+        transition(self.order.pk, "seen")
+        response = self.client.get(f"/api/requests/{self.order.pk}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        # Other query strings are other representations
+        self.assertNotEqual(self.client.get("/api/requests/", {"page": 2})["ETag"], response["ETag"])
+
+    def test_contacts(self):
+        contact = Contact.objects.create(
+            fullName="Client", email="client@example.com", phoneNumber="0", message="Hi"
+        )
+        etag, response = self.revalidate("/api/contacts/")
+        self.assertEqual(response.status_code, 304)
+
+        set_contacts_read(Contact.objects.filter(pk=contact.pk), True)
+        response = self.client.get("/api/contacts/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_statistics_follow_the_rollups(self):
+        url = reverse("stats-calculate")
+        etag, response = self.revalidate(url)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_request()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total_requests"], 2)
+
+
+class FastJSONTests(TestCase):
+    data = {
+        "results": [{"name": "Zoubir été", "price": 2500, "when": timezone.now()}],
+        "ratio": 0.5,
+        "none": None,
+    }
+
+    def test_renderer_matches_the_stdlib_output(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        # Indented output is left to the stdlib
+        indented = FastJSONRenderer().render(self.data, "application/json; indent=2")
+        self.assertIn(b'\n  "results"', indented)
+
+    def test_parser(self):
+        body = FastJSONRenderer().render({"frontImage": "data:image/png;base64,AAAA", "quantity": 2})
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(body)),
+            {"frontImage": "data:image/png;base64,AAAA", "quantity": 2},
+        )
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"quantity": NaN}'))
+
+    def test_fallback_without_orjson(self):
+        with mock.patch("main.renderers.orjson", None), mock.patch("main.parsers.orjson", None):
+            body = FastJSONRenderer().render({"name": "été"})
+            self.assertEqual(FastJSONParser().parse(BytesIO(body)), {"name": "été"})
+
+    def test_api_round_trip(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("admin@example.com"))
+        make_request(name="Zoubir")
+        response = client.get("/api/requests/")
+        self.assertEqual(response.json()["results"][0]["name"], "Zoubir")
+
+        response = client.post(
+            "/api/requests/", b'{"article": "mug", "phone": "0550000000"',
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_json", rows=5, image_size=1024, repeat=2, stdout=out)
+        self.assertIn("render 5-row list page", out.getvalue())
+        self.assertIn("order body", out.getvalue())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+        self.karim = make_request(name="Karim Benali", city="Oran", phone="0661234567")
+        self.sara = make_request(name="Sara", city="Alger", description="Karim's sister", state="pending")
+        make_request(name="Yacine", city="Blida", text="Joker")
+        Contact.objects.create(
+            fullName="Nadia", email="nadia@example.com", phoneNumber="0", message="Mug order"
+        )
+        Contact.objects.create(
+            fullName="Omar", email="omar@example.com", phoneNumber="0", message="Hello"
+        )
+
+    def names(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row.get("name") or row.get("fullName") for row in response.json()["results"]]
+
+    def test_requests(self):
+        self.assertCountEqual(self.names("/api/requests/", q="karim"), ["Karim Benali", "Sara"])
+        self.assertEqual(self.names("/api/requests/", q="karim oran"), ["Karim Benali"])
+        # Prefix match on the phone number
+        self.assertEqual(self.names("/api/requests/", q="066"), ["Karim Benali"])
+        self.assertEqual(self.names("/api/requests/", q="joker"), ["Yacine"])
+        self.assertEqual(self.names("/api/requests/pending/", q="karim"), ["Sara"])
+        self.assertEqual(len(self.names("/api/requests/", q="!!")), 3)
+
+    def test_contacts(self):
+        self.assertEqual(self.names("/api/contacts/", q="mug"), ["Nadia"])
+        self.assertEqual(self.names("/api/contacts/unread/", q="omar"), ["Omar"])
+
+    @skipUnless(connection.vendor == "postgresql", "GIN full-text indexes are PostgreSQL only")
+    def test_ranked_and_indexed(self):
+        # Best match first: Karim is in the name of one, the description of the other
+        self.assertEqual(self.names("/api/requests/", q="karim")[0], "Karim Benali")
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+        plan = search(Request.objects.all(), REQUEST_SEARCH_FIELDS, "karim").explain()
+        self.assertIn("request_search_idx", plan)
+
+
+@override_settings(TIME_ZONE="Africa/Algiers")
+class StatisticsSeriesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+        self.url = reverse("stats-series")
+
+    def create(self, when, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_request(creation_date=when, **kwargs)
+
+    def series(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_daily_buckets_follow_the_timezone(self):
+        # 23:30 UTC on the 1st is already the 2nd in Algiers (UTC+1)
+        self.create(timezone.datetime(2024, 3, 1, 23, 30, tzinfo=timezone.utc), price=100, state="finished")
+        self.create(timezone.datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc), repetitions=2)
+
+        series = self.series(start_date="2024-03-01", end_date="2024-03-03")
+
+        self.assertEqual([row["date"] for row in series], ["2024-03-01", "2024-03-02", "2024-03-03"])
+        self.assertEqual([row["total_requests"] for row in series], [1, 1, 0])
+        self.assertEqual(series[0]["repetitions_count"], 2)
+        self.assertEqual(series[1]["total_revenue"], 100)
+        self.assertEqual(series[1]["conversion_rate"], 100)
+
+    def test_weekly_and_monthly_buckets(self):
+        for day in (4, 10, 11, 30):  # Mondays 4 and 11 March 2024
+            self.create(timezone.datetime(2024, 3, day, 12, tzinfo=timezone.utc))
+
+        weeks = self.series(start_date="2024-03-06", end_date="2024-03-31", interval="week")
+        self.assertEqual(
+            [(row["date"], row["total_requests"]) for row in weeks],
+            [("2024-03-04", 1), ("2024-03-11", 1), ("2024-03-18", 0), ("2024-03-25", 1)],
+        )
+        months = self.series(start_date="2024-02-15", end_date="2024-04-01", interval="month")
+        self.assertEqual(
+            [(row["date"], row["total_requests"]) for row in months],
+            [("2024-02-01", 0), ("2024-03-01", 4), ("2024-04-01", 0)],
+        )
+
+    def test_single_query(self):
+        cache.clear()
+        # The ETag sequence, then the grouped rollup read
+        with self.assertNumQueries(2):
+            series = self.series(interval="day")
+        self.assertEqual(len(series), 30)
+        self.assertEqual(series[-1]["date"], str(timezone.localdate()))
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get(self.url, {"interval": "year"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"start_date": "yesterday"}).status_code, 400)
+        response = self.client.get(self.url, {"start_date": "2024-03-02", "end_date": "2024-03-01"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bucket_cap(self):
+        self.assertEqual(len(self.series(start_date="2023-03-01", end_date="2024-04-03")), 400)
+        response = self.client.get(self.url, {"start_date": "1900-01-01"})
+        self.assertEqual(response.status_code, 400)
+        # Long ranges fit in longer intervals
+        months = self.series(start_date="2010-01-01", end_date="2024-12-31", interval="month")
+        self.assertEqual(len(months), 180)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class FirstVisitTests(TestCase):
+    def test_parsed_on_save(self):
+        order = make_request(uuid="1700000000000-ab12cd")
+        expected = timezone.datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc)
+        self.assertEqual(order.first_visit, expected)
+        self.assertEqual(Request.objects.get(first_visit__lt=timezone.now()).pk, order.pk)
+
+        order.uuid = "1600000000000-ef34"
+        order.save(update_fields=["uuid"])
+        order.refresh_from_db()
+        self.assertEqual(order.first_visit.year, 2020)
+        self.assertEqual(order.first_visit_date, order.first_visit)
+
+    def test_unparseable_uuids(self):
+        for uuid in (None, "", "visitor-42", "not a uuid", "9" * 30 + "-x"):
+            order = make_request(uuid=uuid)
+            self.assertIsNone(order.first_visit, uuid)
+            self.assertEqual(order.first_visit_date, "-")
+
+    def test_backfill(self):
+        order = make_request(uuid="1700000000000-ab12cd")
+        Request.objects.filter(pk=order.pk).update(first_visit=None)
+        migration = import_module("main.migrations.0020_request_first_visit")
+        migration.backfill_first_visit(apps, None)
+        order.refresh_from_db()
+        self.assertEqual(order.first_visit.year, 2023)
+
+    def test_indexed(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # The tiny test table would otherwise be sequentially scanned
+                cursor.execute("SET enable_seqscan = off")
+        plan = Request.objects.filter(first_visit__gte=timezone.now()).explain()
+        self.assertIn("request_first_visit_idx", plan)
+
+
+class IdempotentSubmissionTests(LocalMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.payload = {
+            "article": "mug", "phone": "0550000000", "color": "black",
+            "uuid": "1700000000000-ab12cd",
+        }
+
+    def submit(self, payload=None, key=None, **kwargs):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post("/api/requests/", payload or self.payload, **headers, **kwargs)
+
+    def test_replay_returns_the_original_response(self):
+        first = self.submit(key="order-1", format="json")
+        with mock.patch("main.serializers.attach_image") as attach:
+            replay = self.submit(key="order-1", format="json")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        attach.assert_not_called()
+        self.assertEqual(Request.objects.count(), 1)
+        self.assertEqual(Request.objects.get().repetitions, 1)
+
+    def test_key_reused_for_another_payload(self):
+        self.submit(key="order-1", format="json")
+        other = {**self.payload, "name": "Someone else", "city": "Oran"}
+        response = self.submit(other, key="order-1", format="json")
+        self.assertEqual(response.status_code, 422)
+        self.assertNotIn("id", response.json())
+        self.assertEqual(Request.objects.get().repetitions, 0)
+
+    def test_non_object_bodies(self):
+        for body in ([1, 2], "order"):
+            response = self.client.post(
+                "/api/requests/", json.dumps(body), content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_uuid_and_payload_dedupe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.submit({**self.payload, "front_image": png_upload()})
+            self.submit({**self.payload, "front_image": png_upload()})
+            self.submit({**self.payload, "front_image": png_upload()})
+        self.assertEqual(Request.objects.count(), 1)
+        self.assertEqual(StoredImage.objects.get().ref_count, 1)
+
+        order = Request.objects.get(pk=first.json()["id"])
+        self.assertEqual(order.repetitions, 2)
+        today = timezone.localdate()
+        self.assertEqual(range_statistics(today, today)["repetitions_count"], 2)
+
+        # Another design is another order
+        self.submit({**self.payload, "front_image": png_upload(color="blue")})
+        self.assertEqual(Request.objects.count(), 2)
+
+    def test_in_progress_and_failed_submissions(self):
+        Submission.objects.create(key=submission_key_for("order-2"))
+        self.assertEqual(self.submit(key="order-2", format="json").status_code, 409)
+
+        # A lost first attempt is taken over once it is old enough
+        Submission.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.submit(key="order-2", format="json").status_code, 201)
+
+        # Invalid submissions are not remembered
+        self.assertEqual(self.submit({"article": "car"}, key="order-3", format="json").status_code, 400)
+        self.assertEqual(Submission.objects.filter(request__isnull=True).count(), 0)
+
+    def test_old_submissions_are_new_orders(self):
+        self.submit(format="json")
+        Submission.objects.update(created_at=timezone.now() - timedelta(days=30))
+        # The same design ordered again weeks later
+        response = self.submit(format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(Request.objects.count(), 2)
+        self.assertEqual(Request.objects.filter(repetitions=0).count(), 2)
+
+    def test_purge(self):
+        self.submit(key="old", format="json")
+        Submission.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.submit(key="recent", format="json")
+        call_command("purge_submissions", stdout=StringIO())
+        self.assertEqual(Submission.objects.get().key, submission_key_for("recent"))
+
+    def test_payload_hash_streams_large_text(self):
+        image = "data:image/png;base64," + "A" * (8 * 1024 * 1024)
+        tracemalloc.start()
+        try:
+            digest = payload_hash({"frontImage": image, "article": "mug"})
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, 1024 * 1024)
+        self.assertEqual(digest, payload_hash({"article": "mug", "frontImage": image}))
+        self.assertNotEqual(digest, payload_hash({"frontImage": image + "A", "article": "mug"}))
+
+    def test_without_key_or_uuid(self):
+        payload = {"article": "mug", "phone": "0550000000"}
+        self.submit(payload, format="json")
+        self.submit(payload, format="json")
+        self.assertEqual(Request.objects.count(), 2)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin@example.com"))
+        make_request(name="Karim", city="Oran", state="finished", price=2500)
+        make_request(name="Sara, \"Jr\"", state="pending", creation_date=timezone.now() - timedelta(days=40))
+        Contact.objects.create(fullName="Nadia", email="n@example.com", phoneNumber="0", message="Hi")
+
+    def export(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_requests_csv(self):
+        response, content = self.export("/api/requests/export/")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="requests.csv"', response["Content-Disposition"])
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0], list(RequestViewSet.export_columns))
+        self.assertEqual([row[3] for row in rows[1:]], ["Karim", 'Sara, "Jr"'])
+
+    def test_csv_formulas_are_neutralized(self):
+        make_request(
+            name='=HYPERLINK("http://evil")', phone="+213550000000", city="@SUM(A1)",
+            state="seen", price=300,
+        )
+        _, content = self.export("/api/requests/export/", state="seen", fields="name,phone,city,price")
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[1], ["'=HYPERLINK(\"http://evil\")", "'+213550000000", "'@SUM(A1)", "300"])
+        # Other formats keep the values as they are
+        _, content = self.export("/api/requests/export/", state="seen", fields="name", format="ndjson")
+        self.assertEqual(json.loads(content)["name"], '=HYPERLINK("http://evil")')
+
+    def test_filters_and_ndjson(self):
+        since = (timezone.localdate() - timedelta(days=7)).isoformat()
+        _, content = self.export(
+            "/api/requests/export/", format="ndjson", start_date=since, fields="name,price"
+        )
+        self.assertEqual([json.loads(line) for line in content.splitlines()], [
+            {"name": "Karim", "price": 2500},
+        ])
+        _, content = self.export("/api/requests/export/", state="pending", q="sara", fields="name")
+        self.assertEqual(content.splitlines(), ["name", '"Sara, ""Jr"""'])
+
+        self.assertEqual(self.client.get("/api/requests/export/", {"state": "lost"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/requests/export/", {"fields": "secret"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/contacts/export/", {"read": "maybe"}).status_code, 400)
+
+    def test_contacts(self):
+        _, content = self.export("/api/contacts/export/", read="false", format="ndjson")
+        [row] = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual((row["fullName"], row["read"]), ("Nadia", False))
+
+    def test_streams_one_chunk_per_batch(self):
+        for index in range(5):
+            make_request(name=f"Client {index}")
+        with mock.patch("main.views.stream_export", partial(stream_export, chunk_size=2)):
+            response = self.client.get("/api/requests/export/", {"fields": "id"})
+        # The header, then 7 rows in batches of 2
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(len(b"".join(chunks).splitlines()), 8)
+
+    async def test_streams_asynchronously_under_asgi(self):
+        token = await sync_to_async(Token.objects.create)(
+            user=await sync_to_async(User.objects.create_user)("asgi@example.com")
+        )
+        response = await AsyncClient().get(
+            "/api/requests/export/", {"fields": "name"}, headers={"Authorization": f"Token {token.key}"}
+        )
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(content.decode().splitlines(), ["name", "Karim", '"Sara, ""Jr"""'])
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get("/api/requests/export/").status_code, 401)
+
+
+@skipUnless(Faker, "Faker is a development dependency, see requirements-dev.txt")
+class GenerateFixturesTests(TestCase):
+    def generate(self, **options):
+        call_command(
+            "generate_fixtures", requests=300, contacts=40, images=0.5, days=30,
+            batch_size=120, stdout=StringIO(), **options
+        )
+
+    def dataset(self):
+        return (
+            list(Request.objects.order_by("creation_date", "uuid").values_list(
+                "creation_date", "state", "article", "price", "uuid"
+            )),
+            list(Contact.objects.order_by("timestamp").values_list("timestamp", "read")),
+        )
+
+    def test_reproducible(self):
+        self.generate(seed=7)
+        first = self.dataset()
+        Request.objects.all().delete()
+        Contact.objects.all().delete()
+        self.generate(seed=7)
+        self.assertEqual(self.dataset(), first)
+        self.generate(seed=8)
+        self.assertEqual(Request.objects.count(), 600)
+
+    def test_realistic_and_consistent(self):
+        self.generate()
+        self.assertEqual(Request.objects.count(), 300)
+        self.assertEqual(Contact.objects.count(), 40)
+        self.assertTrue(Picture.objects.exists())
+        self.assertFalse(Request.objects.filter(city__isnull=True).exists())
+        # Contact timestamps are spread over the period, not all "now"
+        self.assertGreater(Contact.objects.dates("timestamp", "day").count(), 5)
+        contact = Contact.objects.create(fullName="New", email="n@example.com", phoneNumber="0", message="Hi")
+        self.assertEqual(timezone.localdate(contact.timestamp), timezone.localdate())
+        old = Request.objects.filter(creation_date__lt=timezone.now() - timedelta(days=10))
+        self.assertGreater(old.filter(state="finished").count(), old.count() / 2)
+        for order in Request.objects.all()[:20]:
+            self.assertLessEqual(order.first_visit, order.creation_date)
+            # The uuid prefix encodes the first visit, to the millisecond
+            self.assertLess(abs(uuid_to_date(order.uuid) - order.first_visit), timedelta(seconds=1))
+
+        # Rollups and counters are rebuilt after the signal-less inserts
+        start = timezone.localdate() - timedelta(days=29)
+        stats = range_statistics(start, timezone.localdate())
+        self.assertEqual(stats["total_requests"], 300)
+        self.assertEqual(reconcile_counters(), {})
+
+
+def percentile(samples, share):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+@skipUnless(os.environ.get("RUN_BENCHMARKS"), "Set RUN_BENCHMARKS=1 to run the benchmarks")
+@skipUnless(Faker, "Faker is a development dependency, see requirements-dev.txt")
+class BenchmarkTests(LocalMediaMixin, TestCase):
+    """
+    Time the API hot paths against a large generated dataset. Sizes and
+    repetitions come from BENCHMARK_REQUESTS, BENCHMARK_CONTACTS and
+    BENCHMARK_REPEAT; results are written to BENCHMARK_OUTPUT as JSON.
+    """
+
+    results = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.requests = int(os.environ.get("BENCHMARK_REQUESTS", 20000))
+        cls.contacts = int(os.environ.get("BENCHMARK_CONTACTS", 2000))
+        cls.repeat = int(os.environ.get("BENCHMARK_REPEAT", 50))
+        call_command(
+            "generate_fixtures", requests=cls.requests, contacts=cls.contacts,
+            images=0.3, stdout=StringIO(),
+        )
+        cls.user = User.objects.create_user("admin@example.com")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        output = os.environ.get("BENCHMARK_OUTPUT", "benchmark-results.json")
+        with open(output, "w") as file:
+            json.dump(
+                {
+                    "commit": os.environ.get("BENCHMARK_COMMIT"),
+                    "database": connection.vendor,
+                    "requests": cls.requests,
+                    "contacts": cls.contacts,
+                    "repeat": cls.repeat,
+                    "endpoints": cls.results,
+                },
+                file,
+                indent=2,
+            )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def benchmark(self, name, call, max_queries, setup=None):
+        """
+        Run the call repeatedly and record its latency percentiles, its
+        peak traced memory and its queries, checked against the budget.
+        """
+        setup = setup or (lambda: None)
+        setup()
+        call()  # Warm up imports and connection state
+        timings = []
+        for _ in range(self.repeat):
+            setup()
+            started = time.perf_counter()
+            response = call()
+            timings.append(time.perf_counter() - started)
+            self.assertLess(response.status_code, 400, response.content[:200])
+
+        setup()
+        with CaptureQueriesContext(connection) as context:
+            call()
+        # Read them now, the next request resets the query log
+        queries = context.captured_queries
+        setup()
+        tracemalloc.start()
+        try:
+            call()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.results[name] = {
+            "p50_ms": round(percentile(timings, 0.5) * 1000, 3),
+            "p95_ms": round(percentile(timings, 0.95) * 1000, 3),
+            "peak_memory_kb": round(peak / 1024, 1),
+            "queries": len(queries),
+            "max_queries": max_queries,
+        }
+        self.assertLessEqual(
+            len(queries), max_queries,
+            "\n".join(query["sql"] for query in queries),
+        )
+
+    def test_request_list(self):
+        # The ETag sequence, the COUNT(*) and the page
+        self.benchmark(
+            "requests.list", lambda: self.client.get("/api/requests/", {"page": 5}), 3
+        )
+
+    def test_statistics_calculate(self):
+        today = timezone.localdate()
+        params = {"start_date": str(today - timedelta(days=364)), "end_date": str(today)}
+        # Uncached result: the ETag sequences and the rollup rows
+        self.benchmark(
+            "statistics.calculate",
+            lambda: self.client.get(reverse("stats-calculate"), params),
+            2,
+            setup=cache.clear,
+        )
+
+    def test_request_create(self):
+        client = APIClient()
+        submissions = iter(range(10 ** 6))
+
+        def submit():
+            number = next(submissions)
+            # Run the on commit work too, a real commit would pay for it
+            with self.captureOnCommitCallbacks(execute=True):
+                return client.post(
+                    "/api/requests/",
+                    {
+                        "article": "mug", "phone": "0550000000", "color": "black",
+                        "uuid": f"1700000000000-{number:06x}",
+                    },
+                    format="json",
+                )
+
+        # Submission claim and completion, the insert, its two counters and
+        # the pictures of the response: 12 with their savepoints. Then, on
+        # commit, the daily rollup refresh: the day's placeholder and lock,
+        # the two aggregates, the upsert and the sequence bump, 8 with their
+        # savepoint.
+        self.benchmark("requests.create", submit, 20)
+
+    def test_contact_unread_count(self):
+        # The ETag sequence and the counter
+        self.benchmark(
+            "contacts.unread_count",
+            lambda: self.client.get("/api/contacts/unread_count/"),
+            2,
+        )
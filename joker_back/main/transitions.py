@@ -0,0 +1,104 @@
+from django.db import connection, transaction
+
+from .models import Request
+from .signals import requests_updated
+
+REQUEST_STATES = [state for state, _ in Request.request_choices]
+
+# Most requests a single bulk call may change
+BULK_UPDATE_LIMIT = 1000
+
+
+class TooManyRequests(Exception):
+    pass
+
+
+def bulk_update(queryset, **changes):
+    """
+    Apply the changes to every request of the queryset with a single
+    UPDATE ... WHERE id IN (...) and return the affected ids. The matching
+    rows are locked first so the ids returned are exactly the ones updated.
+    """
+    with transaction.atomic():
+        previous = list(
+            queryset.select_for_update()
+            .order_by("id")
+            .values("id", "state", "creation_date")[: BULK_UPDATE_LIMIT + 1]
+        )
+        if len(previous) > BULK_UPDATE_LIMIT:
+            raise TooManyRequests(BULK_UPDATE_LIMIT)
+        ids = [row["id"] for row in previous]
+        if ids:
+            Request.objects.filter(id__in=ids).update(**changes)
+            requests_updated.send(
+                sender=Request, ids=ids, changes=changes, previous=previous
+            )
+    return ids
+
+
+def _locked_transition(pk, expected, changes):
+    """
+    Apply the changes with a single UPDATE ... FROM a locked subselect of
+    the row, RETURNING the state it replaced (PostgreSQL). None when the
+    row is missing or not in an expected state.
+    """
+    quote = connection.ops.quote_name
+    table = quote(Request._meta.db_table)
+    assignments, params = [], []
+    for name, value in changes.items():
+        field = Request._meta.get_field(name)
+        assignments.append(f"{quote(field.column)} = %s")
+        params.append(field.get_db_prep_save(value, connection))
+    condition = "id = %s"
+    params.append(pk)
+    if expected:
+        condition += f" AND state IN ({', '.join(['%s'] * len(expected))})"
+        params.extend(expected)
+    sql = (
+        f"UPDATE {table} SET {', '.join(assignments)} "
+        f"FROM (SELECT id, state FROM {table} WHERE {condition} FOR UPDATE) AS previous "
+        f"WHERE {table}.id = previous.id RETURNING previous.state"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def transition(pk, new_state, expected=None, **changes):
+    """
+    Compare-and-set the state of one request with a single
+    UPDATE ... SET state=%s WHERE id=%s AND state=%s, touching only
+    the given columns. Returns whether the row was updated.
+
+    Unless `expected` pins a single source state, the state the row left
+    (for the state counters) is returned by the UPDATE itself. SQLite
+    cannot return it, so there the row is read first.
+    """
+    changes["state"] = new_state
+    with transaction.atomic():
+        if expected and len(set(expected)) == 1:
+            previous_state = expected[0]
+            if not Request.objects.filter(pk=pk, state=previous_state).update(**changes):
+                return False
+        elif connection.vendor == "postgresql":
+            previous_state = _locked_transition(pk, expected, changes)
+            if previous_state is None:
+                return False
+        else:
+            previous_state = (
+                Request.objects.select_for_update()
+                .filter(pk=pk)
+                .values_list("state", flat=True)
+                .first()
+            )
+            if previous_state is None or (expected and previous_state not in expected):
+                return False
+            Request.objects.filter(pk=pk, state=previous_state).update(**changes)
+        requests_updated.send(
+            sender=Request,
+            ids=[pk],
+            changes=changes,
+            previous_states={pk: previous_state},
+        )
+    return True
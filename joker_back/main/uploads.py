@@ -0,0 +1,106 @@
+import time
+
+from django.db import transaction
+
+from .models import PendingUpload, Picture, Request, StoredImage
+from .signals import requests_updated
+
+MAX_UPLOAD_ATTEMPTS = 5
+
+
+def design_filename(order, slot, image):
+    """Storage name of a design, keeping the extension of the image's format"""
+    name = getattr(image, 'name', None) or ''
+    ext = name.rsplit('.', 1)[-1].lower() if '.' in name else 'png'
+    return f'{slot}_design_{order.id}.{ext}'
+
+
+def attach_image(order, slot, image):
+    """
+    Attach one design image to the request. The bytes go through the
+    content-addressed store, so a design that is already stored is only
+    referenced, never uploaded again.
+    """
+    name = StoredImage.objects.acquire(image, design_filename(order, slot, image))
+    setattr(order, f'{slot}_image', name)
+
+    if slot == 'back':
+        # Also create a Picture instance for backward compatibility, sharing the file
+        StoredImage.objects.retain(name)
+        Picture.objects.create(request=order, image=name)
+
+
+def stage_uploads(order, images):
+    """Keep the images on local disk and queue them for the upload worker"""
+    for slot, image in images.items():
+        if hasattr(image, 'seek') and callable(image.seek):
+            image.seek(0)
+        upload = PendingUpload(request=order, slot=slot)
+        upload.file.save(design_filename(order, slot, image), image, save=True)
+    order.upload_status = 'pending'
+    order.save(update_fields=['upload_status'])
+
+
+def set_upload_status(pk, upload_status):
+    Request.objects.filter(pk=pk).update(upload_status=upload_status)
+    requests_updated.send(sender=Request, ids=[pk], changes={'upload_status': upload_status})
+
+
+def push_upload(upload):
+    """Move one staged image to the default storage and attach it"""
+    order = upload.request
+    upload.file.open('rb')
+    try:
+        attach_image(order, upload.slot, upload.file)
+    finally:
+        upload.file.close()
+    order.save(update_fields=[f'{upload.slot}_image'])
+
+    upload.file.delete(save=False)
+    upload.delete()
+    if not order.pending_uploads.exists():
+        set_upload_status(order.pk, 'complete')
+
+
+def process_pending_uploads(limit=None):
+    """
+    Push staged uploads to the default storage, oldest first. Rows are
+    claimed with SKIP LOCKED so several workers can run side by side.
+    Returns the number of uploads pushed and the number that failed.
+    """
+    pushed = failed = 0
+    # Failed uploads are retried on the next pass, not in a tight loop
+    failed_ids = []
+    while limit is None or pushed + failed < limit:
+        with transaction.atomic():
+            upload = (
+                PendingUpload.objects.select_for_update(skip_locked=True)
+                .filter(attempts__lt=MAX_UPLOAD_ATTEMPTS)
+                .exclude(id__in=failed_ids)
+                .order_by('id')
+                .first()
+            )
+            if upload is None:
+                break
+            try:
+                with transaction.atomic():
+                    push_upload(upload)
+                pushed += 1
+            except Exception as e:
+                print(f"Error pushing {upload.slot} image of request {upload.request_id}: {e}")
+                upload.attempts += 1
+                upload.last_error = str(e)
+                upload.save(update_fields=['attempts', 'last_error'])
+                if upload.attempts >= MAX_UPLOAD_ATTEMPTS:
+                    set_upload_status(upload.request_id, 'failed')
+                failed_ids.append(upload.id)
+                failed += 1
+    return pushed, failed
+
+
+def run_upload_worker(interval=5):
+    """Poll the upload queue forever"""
+    while True:
+        pushed, failed = process_pending_uploads()
+        if not pushed and not failed:
+            time.sleep(interval)
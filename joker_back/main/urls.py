@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserList, RequestViewSet, StatisticsView, UserInfoView, ContactViewSet
+from .views import UserList, RequestViewSet, StatisticsView, UserInfoView, ContactViewSet, EventTicketView, event_stream
 
 # Create a router and register our viewset
 router = DefaultRouter()
@@ -11,6 +11,9 @@ urlpatterns = [
     path('', include(router.urls)),  # This creates all CRUD endpoints for requests
     path('users/', UserList.as_view(), name='users'),
     path('statistics/calculate/', StatisticsView.as_view({'get': 'calculate'}), name='stats-calculate'),
+    path('statistics/series/', StatisticsView.as_view({'get': 'series'}), name='stats-series'),
     path('auth/user-info/', UserInfoView.as_view(), name='user-info'),
     path('auth/user/', UserInfoView.as_view(), name='user-info-alt'),
+    path('events/', event_stream, name='events'),
+    path('events/ticket/', EventTicketView.as_view(), name='events-ticket'),
 ]
\ No newline at end of file
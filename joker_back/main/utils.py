@@ -1,15 +1,26 @@
+import binascii
 import datetime
 import uuid
 import base64
+import hashlib
 import os
-from django.core.files.base import ContentFile
+import tempfile
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
 
 
 def uuid_to_date(uuid):
-    timestamp = uuid.split("-")[0]
-    if timestamp:
-        date = datetime.datetime.fromtimestamp(int(timestamp) / 1000)
-        return date
+    """
+    First visit time encoded in a visitor uuid ("<milliseconds>-<random>"),
+    or None when the uuid does not start with a usable timestamp.
+    """
+    timestamp = (uuid or "").split("-")[0]
+    if not timestamp.isdigit():
+        return None
+    try:
+        return datetime.datetime.fromtimestamp(int(timestamp) / 1000, tz=datetime.timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        return None
 
 
 def generate_unique_filename(instance, filename):
@@ -19,23 +30,98 @@ def generate_unique_filename(instance, filename):
     return unique_name
 
 
+def content_hash(content):
+    """SHA-256 of a file's bytes, read chunk by chunk"""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek') and callable(content.seek):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_addressed_filename(digest, filename):
+    """Name a stored file after its content so identical bytes share one name"""
+    ext = filename.split('.')[-1] if '.' in filename else 'png'
+    return f"{digest[:2]}/{digest}.{ext}"
+
+
+def local_storage():
+    """Local filesystem storage under MEDIA_ROOT, whatever DEFAULT_FILE_STORAGE is"""
+    return FileSystemStorage()
+
+
+# Characters of base64 text decoded per step, a multiple of 4
+BASE64_CHUNK_SIZE = 64 * 1024
+# Decoded bytes kept in memory before the upload spills to a temporary file
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+]
+
+
+def detect_image_format(header):
+    """Guess an image file extension from its first bytes"""
+    for signature, ext in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return ext
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
 def base64_to_image(base64_string, filename_prefix):
-    """Convert a base64 string to a Django ContentFile for upload to Cloudinary"""
+    """
+    Convert a base64 string (optionally a data URI) to a Django File for
+    upload to Cloudinary. The text is decoded in fixed-size chunks into a
+    spooled temporary file, so no full-size copy of the payload is made.
+    """
     if not base64_string:
         return None
-    
-    # Remove header if present
-    if "," in base64_string:
-        format, base64_string = base64_string.split(";base64,")
-    
+
+    # Skip the data URI header if present
+    start = 0
+    mime_ext = None
+    if base64_string.startswith("data:"):
+        marker = base64_string.find(";base64,", 0, 256)
+        if marker == -1:
+            print("Error converting base64 to image: unsupported data URI")
+            return None
+        mime_type = base64_string[5:marker]
+        if mime_type.startswith("image/"):
+            mime_ext = mime_type[len("image/"):].replace("jpeg", "jpg")
+        start = marker + len(";base64,")
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
     try:
-        decoded_file = base64.b64decode(base64_string)
-        file_ext = "png"  # Default extension
-        
-        # Generate unique filename
-        filename = f"{filename_prefix}_{uuid.uuid4().hex}.{file_ext}"
-        
-        return ContentFile(decoded_file, name=filename)
-    except Exception as e:
+        carry = ""
+        header = b""
+        for offset in range(start, len(base64_string), BASE64_CHUNK_SIZE):
+            text = carry + "".join(
+                base64_string[offset:offset + BASE64_CHUNK_SIZE].split()
+            )
+            usable = len(text) - len(text) % 4
+            carry = text[usable:]
+            decoded = base64.b64decode(text[:usable], validate=True)
+            if len(header) < 16:
+                header += decoded[:16]
+            output.write(decoded)
+        if carry:
+            # Unpadded input: restore the padding of the last group
+            output.write(base64.b64decode(carry + "=" * (-len(carry) % 4), validate=True))
+    except (binascii.Error, ValueError) as e:
+        output.close()
         print(f"Error converting base64 to image: {e}")
         return None
+
+    file_ext = detect_image_format(header) or mime_ext or "png"
+    # Generate unique filename
+    filename = f"{filename_prefix}_{uuid.uuid4().hex}.{file_ext}"
+    output.seek(0)
+    return File(output, name=filename)
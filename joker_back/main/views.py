@@ -1,13 +1,91 @@
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from django.contrib.auth import authenticate, login
+from django.db.models import OuterRef, Subquery
 from django.utils import timezone
-from django.db.models import Count, Sum
 from .serializers import UserSerializer, RequestSerializer, StatisticsSerializer, ContactSerializer
-from .models import User, Request, Contact
+from .models import User, Request, Contact, Picture
+from .pagination import paginated_response
+from .renderers import CSVRenderer, NDJSONRenderer
+from .search import CONTACT_SEARCH_FIELDS, REQUEST_SEARCH_FIELDS, FullTextSearchFilter
+from .statistics import (
+    MAX_RANGE_DAYS,
+    MAX_SERIES_BUCKETS,
+    RANGE_SEQUENCES,
+    SERIES_INTERVALS,
+    RangeTooLong,
+    cached_range_statistics,
+    statistics_series,
+)
+from .streaming import stream_export, stream_ndjson
+from .transitions import REQUEST_STATES, TooManyRequests, bulk_update, transition
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.authtoken.models import Token
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from .conditional import ConditionalGetMixin
+from .counters import (
+    CONTACTS_SEQUENCE,
+    REQUESTS_SEQUENCE,
+    UNREAD_CONTACTS,
+    counter_values,
+    request_counter,
+)
+from .events import format_sse, get_broker, issue_stream_ticket, redeem_stream_ticket
+from .idempotency import (
+    SubmissionInProgress,
+    SubmissionMismatch,
+    claim_submission,
+    complete_submission,
+    count_repetition,
+    release_submission,
+    submission_key,
+)
+import asyncio
+from datetime import date, timedelta
+
+# Renderers of the actions that can also stream NDJSON (?format=ndjson)
+STREAMING_RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+# Export formats, CSV unless ?format=ndjson
+EXPORT_RENDERERS = [CSVRenderer, NDJSONRenderer]
+
+
+def export_queryset(request, queryset, date_field, boolean_filters=()):
+    """
+    Narrow an export by ?start_date=/?end_date= (YYYY-MM-DD) on date_field
+    and by true/false ?<name>= boolean filters. Raises ValidationError.
+    """
+    params = request.query_params
+    for bound, lookup in (('start_date', 'gte'), ('end_date', 'lte')):
+        if params.get(bound):
+            try:
+                day = date.fromisoformat(params[bound])
+            except ValueError:
+                raise ValidationError({bound: 'Dates must be given as YYYY-MM-DD'})
+            queryset = queryset.filter(**{f'{date_field}__date__{lookup}': day})
+    for name in boolean_filters:
+        if name in params:
+            if params[name] not in ('true', 'false'):
+                raise ValidationError({name: 'Must be true or false'})
+            queryset = queryset.filter(**{name: params[name] == 'true'})
+    return queryset
+
+
+def export_columns(request, columns):
+    """The export columns, or the subset picked with ?fields=a,b"""
+    if not request.query_params.get('fields'):
+        return list(columns)
+    requested = request.query_params['fields'].split(',')
+    unknown = set(requested) - set(columns)
+    if unknown:
+        raise ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+    return requested
 
 
 class UserInfoView(APIView):
@@ -35,13 +113,93 @@ class UserList(generics.ListCreateAPIView):
             login(self.request, user)
 
 
-class RequestViewSet(viewsets.ModelViewSet):
+class RequestViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing article requests.
     Provides standard CRUD operations plus custom actions.
     """
     queryset = Request.objects.all().order_by('-creation_date')
     serializer_class = RequestSerializer
+    # Actions returning many rows, which leave the heavy columns out by default
+    collection_actions = ('list', 'unseen', 'pending', 'progress', 'finished')
+    # Legacy base64 blobs, only returned when explicitly asked for
+    list_excluded_fields = ('frontImage', 'backImage')
+    # Fields a bulk action may select requests by
+    bulk_filters = ('state', 'is_seen', 'is_delivered')
+    # Change sequence behind the ETag of every GET
+    etag_sequences = (REQUESTS_SEQUENCE,)
+    # ?q= full-text search
+    filter_backends = [FullTextSearchFilter]
+    search_fields = REQUEST_SEARCH_FIELDS
+    # Columns of the CSV/NDJSON export
+    export_columns = (
+        'id', 'creation_date', 'article', 'name', 'phone', 'city', 'color', 'size',
+        'quantity', 'price', 'state', 'is_seen', 'is_delivered', 'repetitions', 'first_visit',
+    )
+    # Model columns read by the computed serializer fields
+    computed_field_sources = {
+        'front_image_url': ('front_image', 'design'),
+        'back_image_url': ('back_image',),
+    }
+
+    def get_requested_fields(self):
+        """
+        Serializer fields selected by ?fields=a,b or ?exclude=a,b on GET
+        requests. Collection actions default to every field but the legacy
+        blobs; pass an empty ?exclude= to get them all. None means no
+        restriction.
+        """
+        if hasattr(self, '_requested_fields'):
+            return self._requested_fields
+
+        params = self.request.query_params
+        available = list(self.serializer_class().fields)
+        fields = None
+        if self.request.method == 'GET':
+            if 'fields' in params:
+                requested = [name for name in params['fields'].split(',') if name]
+                unknown = set(requested) - set(available)
+                if unknown:
+                    raise ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+                fields = requested
+            elif 'exclude' in params:
+                excluded = set(params['exclude'].split(','))
+                fields = [name for name in available if name not in excluded]
+            elif self.action in self.collection_actions:
+                fields = [name for name in available if name not in self.list_excluded_fields]
+        self._requested_fields = fields
+        return fields
+
+    def get_queryset(self):
+        """
+        Load only the columns the selected fields need, and annotate the
+        fallback back picture so serializing needs no query per row.
+        """
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is not None:
+            model_fields = {field.name for field in Request._meta.concrete_fields}
+            # The id and the pagination key are always needed
+            columns = {'id', 'creation_date'}
+            for name in fields:
+                if name in self.computed_field_sources:
+                    columns.update(self.computed_field_sources[name])
+                elif name in model_fields:
+                    columns.add(name)
+            queryset = queryset.only(*columns)
+        if fields is None or 'back_image_url' in fields:
+            first_picture = (
+                Picture.objects.filter(request=OuterRef('pk')).order_by('pk').values('image')[:1]
+            )
+            queryset = queryset.annotate(fallback_picture=Subquery(first_picture))
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        """Restrict the serializer output to the selected fields"""
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
     
     def get_permissions(self):
         """
@@ -53,63 +211,142 @@ class RequestViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
     
+    def create(self, request, *args, **kwargs):
+        """
+        Create a request once per submission. A retry or double submit
+        (same Idempotency-Key header, or same visitor uuid and payload) gets
+        the original response back and only counts a repetition. Reusing an
+        Idempotency-Key for another payload answers 422.
+        """
+        key, digest = submission_key(request)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        try:
+            submission = claim_submission(key, digest)
+        except SubmissionInProgress:
+            return Response(
+                {'error': 'This submission is already being processed'},
+                status=status.HTTP_409_CONFLICT
+            )
+        except SubmissionMismatch:
+            return Response(
+                {'error': 'This Idempotency-Key was used for another order'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if submission is not None:
+            count_repetition(submission)
+            return Response(
+                submission.response_body,
+                status=submission.response_status,
+                headers={'Idempotent-Replayed': 'true'}
+            )
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            release_submission(key)
+            raise
+        if response.status_code == status.HTTP_201_CREATED:
+            complete_submission(key, response.data['id'], response.status_code, response.data)
+        else:
+            release_submission(key)
+        return response
+
     def list(self, request, *args, **kwargs):
-        """Override list method to add pagination"""
-        page_size = int(request.query_params.get('page_size', 20))
-        page = int(request.query_params.get('page', 1))
-        
-        start = (page - 1) * page_size
-        end = page * page_size
-        
+        """Override list method to add page or cursor pagination"""
         queryset = self.filter_queryset(self.get_queryset())
-        total_count = queryset.count()
-        queryset = queryset[start:end]
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'results': serializer.data,
-            'count': total_count,
-            'page': page,
-            'total_pages': (total_count + page_size - 1) // page_size
-        })
+        return paginated_response(self, queryset, 'creation_date')
     
-    @action(detail=False, methods=['get'])
+    def state_list(self, state):
+        """Paginated requests in one state, or all of them streamed as NDJSON"""
+        queryset = self.filter_queryset(self.get_queryset()).filter(state=state)
+        if self.request.accepted_renderer.format == 'ndjson':
+            return stream_ndjson(
+                queryset.order_by('-creation_date', '-id'), self.get_serializer, request=self.request
+            )
+        return paginated_response(self, queryset, 'creation_date')
+
+    @action(detail=False, methods=['get'], renderer_classes=STREAMING_RENDERERS)
     def unseen(self, request):
-        """Get all unseen requests"""
-        unseen_requests = Request.objects.filter(state="unseen")
-        serializer = self.get_serializer(unseen_requests, many=True)
-        return Response(serializer.data)
+        """Get unseen requests"""
+        return self.state_list("unseen")
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=STREAMING_RENDERERS)
     def pending(self, request):
-        """Get all pending requests"""
-        pending_requests = Request.objects.filter(state="pending")
-        serializer = self.get_serializer(pending_requests, many=True)
-        return Response(serializer.data)
+        """Get pending requests"""
+        return self.state_list("pending")
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=STREAMING_RENDERERS)
     def progress(self, request):
-        """Get all in-progress requests"""
-        in_progress = Request.objects.filter(state="progress")
-        serializer = self.get_serializer(in_progress, many=True)
-        return Response(serializer.data)
+        """Get in-progress requests"""
+        return self.state_list("progress")
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=STREAMING_RENDERERS)
     def finished(self, request):
-        """Get all finished requests"""
-        finished = Request.objects.filter(state="finished")
-        serializer = self.get_serializer(finished, many=True)
-        return Response(serializer.data)
+        """Get finished requests"""
+        return self.state_list("finished")
     
+    @action(detail=False, methods=['get'])
+    def counts(self, request):
+        """Get the number of requests in each state, read from the counter store"""
+        values = counter_values(*map(request_counter, REQUEST_STATES))
+        return Response(dict(zip(REQUEST_STATES, values)))
+
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """
+        Stream every matching request as CSV or NDJSON (?format=ndjson), in
+        constant memory. Filters: ?q=, ?state=, ?is_seen=, ?is_delivered=,
+        ?start_date=, ?end_date=.
+        """
+        columns = export_columns(request, self.export_columns)
+        queryset = export_queryset(
+            request, self.filter_queryset(Request.objects.all()), 'creation_date',
+            ('is_seen', 'is_delivered'),
+        )
+        state = request.query_params.get('state')
+        if state:
+            if state not in REQUEST_STATES:
+                raise ValidationError({'state': 'Invalid status'})
+            queryset = queryset.filter(state=state)
+        return stream_export(request, queryset.order_by('-creation_date', '-id'), columns, 'requests')
+
+    def get_expected_states(self):
+        """Source states given as `expected_status` (one state or a list), if any"""
+        expected = self.request.data.get('expected_status')
+        if expected is None:
+            return None
+        if isinstance(expected, str):
+            expected = [expected]
+        if not isinstance(expected, list) or not set(expected) <= set(REQUEST_STATES):
+            raise ValidationError({'expected_status': 'Invalid status'})
+        return expected
+
+    def transition_response(self, pk, new_state, message, **changes):
+        """
+        Apply a state transition with one conditional UPDATE. Answers 409
+        when the row is no longer in an expected state and 404 when it does
+        not exist.
+        """
+        expected = self.get_expected_states()
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound()
+        if not transition(pk, new_state, expected, **changes):
+            if not Request.objects.filter(pk=pk).exists():
+                raise NotFound()
+            return Response(
+                {'error': 'Request status changed concurrently', 'expected_status': expected},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response({'status': message, 'state': new_state, **changes})
+
     @action(detail=True, methods=['post'])
     def mark_seen(self, request, pk=None):
-        """Mark a request as seen without changing its state"""
-        request_obj = self.get_object()
+        """Mark a request as seen, optionally only from the `expected_status` states"""
         # Update both is_seen flag AND state to "seen"
-        request_obj.is_seen = True
-        request_obj.state = "seen"
-        request_obj.save()
-        return Response({'status': 'request marked as seen', 'is_seen': True, 'state': 'seen'})
+        return self.transition_response(pk, 'seen', 'request marked as seen', is_seen=True)
     
     @action(detail=True, methods=['post'])
     def mark_delivered(self, request, pk=None):
@@ -121,23 +358,80 @@ class RequestViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
-        """Update the status of a request"""
-        request_obj = self.get_object()
+        """Update the status of a request, optionally only from the `expected_status` states"""
         new_status = request.data.get('status')
         
-        if new_status not in ["unseen", "seen", "pending", "progress", "finished"]:
+        if new_status not in REQUEST_STATES:
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
             
-        request_obj.state = new_status
-        request_obj.save()
-        return Response({'status': f'request status updated to {new_status}'})
+        return self.transition_response(pk, new_status, f'request status updated to {new_status}')
+
+    def get_bulk_queryset(self):
+        """Requests targeted by a bulk action, given as a list of `ids` or a `filter`"""
+        ids = self.request.data.get('ids')
+        filters = self.request.data.get('filter')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                raise ValidationError({'ids': 'Expected a list of request ids'})
+            return Request.objects.filter(id__in=ids)
+        if isinstance(filters, dict) and filters:
+            unknown = set(filters) - set(self.bulk_filters)
+            if unknown:
+                raise ValidationError({'filter': f"Unsupported filters: {', '.join(sorted(unknown))}"})
+            if 'state' in filters and filters['state'] not in REQUEST_STATES:
+                raise ValidationError({'filter': 'Invalid status'})
+            for name in ('is_seen', 'is_delivered'):
+                if name in filters and not isinstance(filters[name], bool):
+                    raise ValidationError({'filter': f'{name} must be true or false'})
+            return Request.objects.filter(**filters)
+        raise ValidationError({'error': 'Provide a list of ids or a filter'})
+
+    def bulk_response(self, **changes):
+        try:
+            ids = bulk_update(self.get_bulk_queryset(), **changes)
+        except TooManyRequests as e:
+            return Response(
+                {'error': f'More than {e} requests matched, narrow the selection'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'updated': ids, 'count': len(ids)})
+
+    @action(detail=False, methods=['post'])
+    def bulk_mark_seen(self, request):
+        """Mark many requests as seen with a single UPDATE"""
+        return self.bulk_response(is_seen=True, state='seen')
 
+    @action(detail=False, methods=['post'])
+    def bulk_mark_delivered(self, request):
+        """Mark many requests as delivered with a single UPDATE"""
+        return self.bulk_response(is_delivered=True)
 
-class StatisticsView(viewsets.ViewSet):
+    @action(detail=False, methods=['post'])
+    def bulk_update_status(self, request):
+        """Update the status of many requests with a single UPDATE"""
+        new_status = request.data.get('status')
+        if new_status not in REQUEST_STATES:
+            return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
+        return self.bulk_response(state=new_status)
+
+
+class StatisticsView(ConditionalGetMixin, viewsets.ViewSet):
     """
     ViewSet for retrieving statistics about requests.
     """
     serializer_class = StatisticsSerializer
+    etag_sequences = RANGE_SEQUENCES
+
+    def get_permissions(self):
+        """The chart series are for the dashboard only"""
+        if self.action == 'series':
+            return [IsAuthenticated()]
+        return super().get_permissions()
+
+    def get_etag(self, request):
+        # Without a date range the statistics are today's
+        etag = super().get_etag(request)
+        return f'{etag[:-1]}-{timezone.localdate()}"'
     
     @action(detail=False, methods=['get'])
     def calculate(self, request):
@@ -150,74 +444,16 @@ class StatisticsView(viewsets.ViewSet):
                 today = timezone.now().date()
                 start_date = end_date = today
 
-            # Make sure we're using proper date filtering
-            requests = Request.objects.filter(
-                creation_date__date__range=[start_date, end_date]
-            )
-
-            # Calculate statistics with proper error handling
-            total_requests = requests.count()
-            unseen_requests = requests.filter(state="unseen").count()
-            seen_requests = requests.filter(state="seen").count()  # Added seen counter
-            pending_requests = requests.filter(state="pending").count()
-            in_progress_requests = requests.filter(state="progress").count()
-            finished_requests = requests.filter(state="finished").count()
-            delivered_requests = requests.filter(is_delivered=True).count()
-
-            conversion_rate = (
-                (finished_requests + delivered_requests) / total_requests * 100
-                if total_requests > 0
-                else 0
-            )
-
-            total_revenue = (
-                requests.filter(state__in=["finished", "delivered"]).aggregate(Sum("price"))["price__sum"]
-                or 0
-            )
-
-            repetitions_count = (
-                requests.aggregate(Sum("repetitions"))["repetitions__sum"] or 0
-            )
-
-            # Handle potentially missing data
-            try:
-                top_article_obj = (
-                    requests.values("article")
-                    .annotate(count=Count("article"))
-                    .order_by("-count")
-                    .first()
-                )
-                top_article = top_article_obj["article"] if top_article_obj else ""
-            except:
-                top_article = ""
-
-            try:
-                top_color_obj = (
-                    requests.values("color")
-                    .annotate(count=Count("color"))
-                    .order_by("-count")
-                    .first()
-                )
-                top_color = top_color_obj["color"] if top_color_obj else ""
-            except:
-                top_color = ""
-
-            data = {
-                "total_requests": total_requests,
-                "unseen_requests": unseen_requests,
-                "seen_requests": seen_requests,  # Added seen counter to response
-                "pending_requests": pending_requests,
-                "in_progress_requests": in_progress_requests,
-                "finished_requests": finished_requests,
-                "delivered_requests": delivered_requests,
-                "conversion_rate": conversion_rate,
-                "total_revenue": total_revenue,
-                "repetitions_count": repetitions_count,
-                "top_article": top_article,
-                "top_color": top_color,
-            }
+            # Read the daily rollups instead of scanning the requests table,
+            # memoized per date range on the sequences the ETag just read
+            data = cached_range_statistics(start_date, end_date, self.sequence_values)
             serializer = StatisticsSerializer(data)
             return Response(serializer.data)
+        except RangeTooLong:
+            return Response(
+                {"error": f"The date range may cover at most {MAX_RANGE_DAYS} days"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             # Better error handling
             print(f"Error calculating statistics: {str(e)}")
@@ -226,34 +462,65 @@ class StatisticsView(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['get'])
+    def series(self, request):
+        """
+        Counters per day, week or month (?interval=) for charts, the last 30
+        days by default
+        """
+        interval = request.query_params.get("interval", "day")
+        if interval not in SERIES_INTERVALS:
+            return Response(
+                {"error": f"interval must be one of {', '.join(SERIES_INTERVALS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            end_date = request.query_params.get("end_date")
+            end_date = date.fromisoformat(end_date) if end_date else timezone.localdate()
+            start_date = request.query_params.get("start_date")
+            start_date = date.fromisoformat(start_date) if start_date else end_date - timedelta(days=29)
+        except ValueError:
+            return Response(
+                {"error": "Dates must be given as YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start_date > end_date:
+            return Response(
+                {"error": "start_date must not be after end_date"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            results = statistics_series(start_date, end_date, interval)
+        except RangeTooLong:
+            return Response(
+                {"error": f"A series may have at most {MAX_SERIES_BUCKETS} buckets, "
+                          f"use a longer interval or a shorter range"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            "interval": interval,
+            "start_date": start_date,
+            "end_date": end_date,
+            "results": results,
+        })
+
 
-class ContactViewSet(viewsets.ModelViewSet):
+class ContactViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing contact form submissions.
     Provides standard CRUD operations plus custom actions.
     """
     queryset = Contact.objects.all().order_by('-timestamp')
     serializer_class = ContactSerializer
+    etag_sequences = (CONTACTS_SEQUENCE,)
+    filter_backends = [FullTextSearchFilter]
+    search_fields = CONTACT_SEARCH_FIELDS
+    export_columns = ('id', 'timestamp', 'fullName', 'email', 'phoneNumber', 'message', 'read')
     
     def list(self, request, *args, **kwargs):
-        """Override list method to add pagination"""
-        page_size = int(request.query_params.get('page_size', 20))
-        page = int(request.query_params.get('page', 1))
-        
-        start = (page - 1) * page_size
-        end = page * page_size
-        
+        """Override list method to add page or cursor pagination"""
         queryset = self.filter_queryset(self.get_queryset())
-        total_count = queryset.count()
-        queryset = queryset[start:end]
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'results': serializer.data,
-            'count': total_count,
-            'page': page,
-            'total_pages': (total_count + page_size - 1) // page_size
-        })
+        return paginated_response(self, queryset, 'timestamp')
     
     def get_permissions(self):
         """
@@ -273,15 +540,92 @@ class ContactViewSet(viewsets.ModelViewSet):
         contact.save()
         return Response({'status': 'message marked as read'})
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=STREAMING_RENDERERS)
     def unread(self, request):
-        """Get all unread contact messages"""
-        unread_messages = Contact.objects.filter(read=False).order_by('-timestamp')
-        serializer = self.get_serializer(unread_messages, many=True)
-        return Response(serializer.data)
+        """Get unread contact messages, paginated or streamed as NDJSON"""
+        queryset = self.filter_queryset(self.get_queryset()).filter(read=False)
+        if request.accepted_renderer.format == 'ndjson':
+            return stream_ndjson(
+                queryset.order_by('-timestamp', '-id'), self.get_serializer, request=self.request
+            )
+        return paginated_response(self, queryset, 'timestamp')
     
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """
+        Stream every matching message as CSV or NDJSON (?format=ndjson).
+        Filters: ?q=, ?read=, ?start_date=, ?end_date=.
+        """
+        columns = export_columns(request, self.export_columns)
+        queryset = export_queryset(
+            request, self.filter_queryset(Contact.objects.all()), 'timestamp', ('read',)
+        )
+        return stream_export(request, queryset.order_by('-timestamp', '-id'), columns, 'contacts')
+
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get count of unread contact messages"""
-        unread_count = Contact.objects.filter(read=False).count()
-        return Response({'unread_count': unread_count})
\ No newline at end of file
+        unread_count, = counter_values(UNREAD_CONTACTS)
+        return Response({'unread_count': unread_count})
+
+
+class EventTicketView(APIView):
+    """Issue a single-use ticket opening one event stream (?ticket=)"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({'ticket': issue_stream_ticket(request.user)})
+
+
+def _event_stream_user(request):
+    """Resolve the user of an event stream from its session, token header or ticket"""
+    if request.user.is_authenticated:
+        return request.user
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Token '):
+        token = Token.objects.select_related('user').filter(key=header[len('Token '):]).first()
+        user = token.user if token else None
+    else:
+        # EventSource cannot send headers: it brings a ticket instead
+        user_id = redeem_stream_ticket(request.GET.get('ticket', ''))
+        user = User.objects.filter(pk=user_id).first() if user_id else None
+    if user and user.is_active:
+        return user
+    return None
+
+
+async def event_stream(request):
+    """
+    Server-Sent Events stream of request.created, request.state_changed and
+    contact.created events, replacing the dashboard polling. Needs an ASGI
+    server so the open streams do not hold a worker each.
+    """
+    if not isinstance(request, ASGIRequest):
+        # A WSGI server would buffer the endless stream and hang the worker
+        return JsonResponse(
+            {'error': 'The event stream needs the ASGI server (joker.asgi)'}, status=503
+        )
+    user = await sync_to_async(_event_stream_user)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    async def events():
+        broker = get_broker()
+        queue = broker.subscribe()
+        try:
+            yield b'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Keep proxies from closing an idle connection
+                    yield b': keepalive\n\n'
+                    continue
+                yield format_sse(event)
+        finally:
+            broker.unsubscribe(queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response